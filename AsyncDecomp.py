@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#
+
+import copy
+import asyncio
+
+from Parser import *
+from Decomp import *
+from Output import *
+
+def parseBytes(data):
+	return WasmParser(BufferParser(data), lazy = True).parseWasm()
+
+#a lazy body is loaded into a private copy of the function, concurrent consumers of one module never change it
+def renderFunction(module, func):
+	if func.loader != None:
+		func = copy.copy(func)
+	output = MemoryWriter()
+	decompileWasmFunction(module, func, output)
+	return output.getvalue()
+
+#every step runs in the executor as its own job, so a huge module only ever holds one slot of the limit at a time
+class AsyncDecompiler:
+	def __init__(self, executor = None, limit = 4):
+		self.executor = executor
+		self.semaphore = asyncio.Semaphore(limit)
+	#the slot is held until the job itself is done, a cancelled caller can not free it while the job still runs
+	async def run(self, function, *args):
+		await self.semaphore.acquire()
+		try:
+			future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+		except BaseException:
+			self.semaphore.release()
+			raise
+		future.add_done_callback(lambda future: self.semaphore.release())
+		return await asyncio.shield(future)
+	async def parse(self, data):
+		return await self.run(parseBytes, data)
+	async def header(self, module):
+		output = MemoryWriter()
+		await self.run(decompileWasmHeader, module, output)
+		return output.getvalue()
+	async def functions(self, data, functions = None):
+		module = data if type(data) == Module else await self.parse(data)
+		if functions == None:
+			functions = module.functions
+		for func in functions:
+			if not func._import:
+				yield func, await self.run(renderFunction, module, func)
+	async def decompile(self, data):
+		module = await self.parse(data)
+		parts = [await self.header(module)]
+		async for func, text in self.functions(module):
+			parts.append(text)
+		return "".join(parts)
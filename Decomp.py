@@ -1,26 +1,100 @@
 #!/usr/bin/env python3
 #
 
-from functools import reduce
+import sys
+import time
+
 from Type import ValType, Function, WasmInstr
+from Output import MemoryWriter
+from FlatIR import calledImports, countInstructions
+import Profile
+
+binaryOperators = {
+	WasmInstr.EQ: " == ", WasmInstr.NE: " != ", WasmInstr.LT: " < ", WasmInstr.GT: " > ", WasmInstr.LE: " <= ", WasmInstr.GE: " >= ",
+	WasmInstr.ADD: " + ", WasmInstr.SUB: " - ", WasmInstr.MUL: " * ", WasmInstr.DIV: " / ", WasmInstr.REM: " % ",
+	WasmInstr.AND: " & ", WasmInstr.OR: " | ", WasmInstr.XOR: " ^ ", WasmInstr.SHL: " << ", WasmInstr.SHR: " >> ",
+}
+
+def joinFragments(items, separator):
+	parts = []
+	for item in items:
+		parts.append(item)
+		parts.append(separator)
+	if len(parts) != 0:
+		parts.pop()
+	return parts
+
+#walks the ast with an explicit stack, so deep expressions neither recurse nor get rebuilt per level
+def renderAst(node, parts):
+	stack = [node]
+	while len(stack) != 0:
+		item = stack.pop()
+		if type(item) == str:
+			parts.append(item)
+		elif isinstance(item, AstNode):
+			fragments = item.fragments()
+			fragments.reverse()
+			stack.extend(fragments)
+		else:
+			parts.append(str(item))
+	return parts
+
+def astToString(node):
+	return "".join(renderAst(node, []))
+
+noReads = frozenset()
+#variables share one read set per index instead of carrying their own
+singleReads = dict()
+
+def readsOf(index):
+	if index == None:
+		return noReads
+	reads = singleReads.get(index)
+	if reads == None:
+		reads = singleReads[index] = frozenset((index,))
+	return reads
+
+#every node carries the locals and globals it reads and whether it reads memory, precomputed from its children
+def collectReads(node, children, memoryRead = False):
+	localReads = noReads
+	globalReads = noReads
+	for child in children:
+		if child.localReads and child.localReads is not localReads:
+			localReads = localReads | child.localReads if localReads else child.localReads
+		if child.globalReads and child.globalReads is not globalReads:
+			globalReads = globalReads | child.globalReads if globalReads else child.globalReads
+		memoryRead = memoryRead or child.memoryRead
+	node.localReads = localReads
+	node.globalReads = globalReads
+	node.memoryRead = memoryRead
 
 class AstNode:
+	__slots__ = ("type",)
+	localReads = noReads
+	globalReads = noReads
+	memoryRead = False
 	def __init__(self, type):
 		self.type = type
 	def readsGlobal(self, index):
-		return False
+		return index in self.globalReads
 	def readsLocal(self, index):
-		return False
+		return index in self.localReads
 	def readsMemory(self, index):
-		return False
+		return self.memoryRead
+	def fragments(self):
+		return ["undef"]
+	def __repr__(self):
+		return astToString(self)
 class ValueAstNode(AstNode):
+	__slots__ = ("value",)
 	def __init__(self, type, value):
 		super().__init__(type)
 		self.value = value
-	def __repr__(self):
-		#return str(self.type) + " " + str(self.value)
-		return str(self.value)
+	def fragments(self):
+		#return [str(self.type), " ", str(self.value)]
+		return [str(self.value)]
 class CallAstNode(AstNode):
+	__slots__ = ("params", "target", "rets")
 	def __init__(self, context, target, type):
 		super().__init__(type)
 		self.params = []
@@ -34,10 +108,14 @@ class CallAstNode(AstNode):
 		self.rets = []
 		for i in range(len(type.ret_vars)):
 			self.rets.append(VarAstNode(type.ret_vars[i], context = context))
-	def __repr__(self):
-		print()
-		return (("(" + ', '.join(map(str,self.rets)) + ") <- ") if len(self.rets) != 0 else "") + "Calling " + (self.target.name if type(self.target) == Function else str(self.target)) + "(" + ', '.join(map(str,self.params)) + ")"
+	def fragments(self):
+		parts = []
+		if len(self.rets) != 0:
+			parts += ["("] + joinFragments(self.rets, ", ") + [") <- "]
+		parts += ["Calling ", self.target.name if type(self.target) == Function else self.target, "("]
+		return parts + joinFragments(self.params, ", ") + [")"]
 class VarAstNode(AstNode):
+	__slots__ = ("globalindex", "localindex", "name")
 	def __init__(self, type, name = None, context = None, globalindex = None, localindex = None):
 		super().__init__(type)
 		self.globalindex = globalindex
@@ -48,77 +126,49 @@ class VarAstNode(AstNode):
 			self.name = name
 		else:
 			assert False
-	def readsGlobal(self, index):
-		return self.globalindex == index
-	def readsLocal(self, index):
-		return self.localindex == index
-	def __repr__(self):
-		return str(self.name)
+	@property
+	def globalReads(self):
+		return readsOf(self.globalindex)
+	@property
+	def localReads(self):
+		return readsOf(self.localindex)
+	def fragments(self):
+		return [str(self.name)]
 class ReturnAstNode(VarAstNode):
+	__slots__ = ("args",)
 	def __init__(self, args = []):
 		self.args = args
-	def __repr__(self):
-		return "Return " + str(self.args)
+	def fragments(self):
+		return ["Return ["] + joinFragments(self.args, ", ") + ["]"]
 class BlockReturnAstNode(VarAstNode):
+	__slots__ = ("args",)
 	def __init__(self, args = [], index = 0):
 		self.args = args
-	def __repr__(self):
-		return "BlockReturn " + str(self.args)
+	def fragments(self):
+		return ["BlockReturn ["] + joinFragments(self.args, ", ") + ["]"]
 class BranchBlockReturnAstNode(BlockReturnAstNode):
+	__slots__ = ("cond",)
 	def __init__(self, cond, args = [], index = 0):
 		super().__init__(args, index)
 		self.cond = cond
-	def __repr__(self):
-		return "if(" + str(self.cond) + ")" + str(super())
+	def fragments(self):
+		return ["if(", self.cond, ")"] + super().fragments()
 class OpAstNode(AstNode):
+	__slots__ = ("args", "valtype", "signed", "localReads", "globalReads", "memoryRead")
 	def __init__(self, args, type, valtype, signed):
 		self.args = args
 		self.type = type
 		self.valtype = valtype
 		self.signed = signed
-	def readsGlobal(self, index):
-		return reduce(lambda x,y: x | y, map(lambda arg: arg.readsGlobal(index), self.args))
-	def readsLocal(self, index):
-		return reduce(lambda x,y: x | y, map(lambda arg: arg.readsLocal(index), self.args))
-	def readsMemory(self, index):
-		return reduce(lambda x,y: x | y, map(lambda arg: arg.readsMemory(index), self.args))
-	def __repr__(self):
+		collectReads(self, args)
+	def fragments(self):
 		if self.type == WasmInstr.EQZ:
-			return "(" + str(self.args[0]) + " == 0)"
-		elif self.type == WasmInstr.EQ:
-			return "(" + ' == '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.NE:
-			return "(" + ' != '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.LT:
-			return "(" + ' < '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.GT:
-			return "(" + ' > '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.LE:
-			return "(" + ' <= '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.GE:
-			return "(" + ' >= '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.ADD:
-			return "(" + ' + '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.SUB:
-			return "(" + ' - '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.MUL:
-			return "(" + ' * '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.DIV:
-			return "(" + ' / '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.REM:
-			return "(" + ' % '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.AND:
-			return "(" + ' & '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.OR:
-			return "(" + ' | '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.XOR:
-			return "(" + ' ^ '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.SHL:
-			return "(" + ' << '.join(map(str, self.args)) + ")"
-		elif self.type == WasmInstr.SHR:
-			return "(" + ' >> '.join(map(str, self.args)) + ")"
-		return str(self.type) + "(" + ', '.join(map(str, self.args)) + ")"
+			return ["(", self.args[0], " == 0)"]
+		elif self.type in binaryOperators:
+			return ["("] + joinFragments(self.args, binaryOperators[self.type]) + [")"]
+		return [str(self.type), "("] + joinFragments(self.args, ", ") + [")"]
 class LoadAstNode(AstNode):
+	__slots__ = ("offset", "base", "align", "length", "valtype", "s_ext", "localReads", "globalReads", "memoryRead")
 	def __init__(self, valtype, base, s_ext, length, align, offset):
 		self.offset = offset
 		self.base = base
@@ -126,17 +176,18 @@ class LoadAstNode(AstNode):
 		self.length = length
 		self.valtype = valtype
 		self.s_ext = s_ext
-	def readsMemory(self, index):
-		return True
-	def __repr__(self):
+		collectReads(self, (base,), memoryRead = True)
+	def fragments(self):
+		load = ["load_%d(" % self.length, self.base, " + %d align %d)" % (self.offset, 2**self.align)]
 		if self.length == 32 and (self.valtype == ValType.I32 or self.valtype == ValType.F32):
-			return "load_%d(%s + %d align %d)" % (self.length, str(self.base), self.offset, 2**self.align)
+			return load
 		elif self.length == 64 and (self.valtype == ValType.I64 or self.valtype == ValType.F64):
-			return "load_%d(%s + %d align %d)" % (self.length, str(self.base), self.offset, 2**self.align)
+			return load
 		elif self.s_ext:
-			return "signed_ext<%s>(load_%d(%s + %d align %d))" % (str(self.valtype), self.length, str(self.base), self.offset, 2**self.align)
-		return "(%s) load_%d(%s + %d align %d)" % (str(self.valtype), self.length, str(self.base), self.offset, 2**self.align)
+			return ["signed_ext<%s>(" % str(self.valtype)] + load + [")"]
+		return ["(%s) " % str(self.valtype)] + load
 class StoreAstNode(AstNode):
+	__slots__ = ("offset", "base", "align", "length", "valtype", "value", "localReads", "globalReads", "memoryRead")
 	def __init__(self, valtype, base, length, align, offset, value):
 		self.offset = offset
 		self.base = base
@@ -144,92 +195,105 @@ class StoreAstNode(AstNode):
 		self.length = length
 		self.valtype = valtype
 		self.value = value
-	def __repr__(self):
-		return "store_%d(%s + %d align %d, %s)" % (self.length, str(self.base), self.offset, 2**self.align, str(self.value))
+		collectReads(self, (base, value))
+	def fragments(self):
+		return ["store_%d(" % self.length, self.base, " + %d align %d, " % (self.offset, 2**self.align), self.value, ")"]
 class CastAstNode(AstNode):
+	__slots__ = ("val", "localReads", "globalReads", "memoryRead")
 	def __init__(self, val, type):
 		self.val = val
 		self.type = type
-	def __repr__(self):
-		return str(type) + " " + str(self.val)
+		collectReads(self, (val,))
+	def fragments(self):
+		return [str(self.type), " ", self.val]
 class ReinterpretAstNode(AstNode):
+	__slots__ = ("val", "localReads", "globalReads", "memoryRead")
 	def __init__(self, val, type):
 		self.val = val
 		self.type = type
-	def __repr__(self):
-		return "Reinterpret " + str(type) + " " + str(self.val)
+		collectReads(self, (val,))
+	def fragments(self):
+		return ["Reinterpret ", str(self.type), " ", self.val]
 class MemSizeAstNode(AstNode):
+	__slots__ = ("size",)
+	memoryRead = True
+	valtype = ValType.I32
 	def __init__(self, size):
 		self.size = size
-	def __repr__(self):
-		return "MemSize(" + str(size) + ")"
+	def fragments(self):
+		return ["MemSize(" + str(self.size) + ")"]
 class MemGrowAstNode(AstNode):
+	__slots__ = ("size",)
 	def __init__(self, size):
 		self.size = size
-	def __repr__(self):
-		return "MemGrow(" + str(size) + ")"
+	def fragments(self):
+		return ["MemGrow(" + str(self.size) + ")"]
 class UnreachableAstNode(AstNode):
+	__slots__ = ()
 	def __init__(self):
 		pass
-	def __repr__(self):
-		return "Unreachable"
+	def fragments(self):
+		return ["Unreachable"]
 class BranchAstNode(AstNode):
+	__slots__ = ("label", "cond")
 	def __init__(self, label, cond):
 		self.label = label
 		self.cond = cond
-	def __repr__(self):
+	def fragments(self):
 		if self.cond:
-			return "branch " + str(self.label)
-		return "if(" + str(self.cond) + ") branch " + str(self.label)
+			return ["branch " + str(self.label)]
+		return ["if(", self.cond, ") branch " + str(self.label)]
 		
 		
 class BlockAstNode(AstNode):
+	__slots__ = ("exprs", "returns", "label")
 	def __init__(self, exprs, returns, label):
 		self.exprs = exprs
 		self.returns = returns
 		self.label = label
-	def __repr__(self):
+	def fragments(self):
 		if len(self.returns) == 0:
-			return "block {" + '; '.join(map(str, self.exprs)) + "}"
-		return ", ".join(map(str, self.returns)) + " <- {" + '; '.join(map(str, self.exprs)) + "}"
+			return ["block {"] + joinFragments(self.exprs, "; ") + ["}"]
+		return joinFragments(self.returns, ", ") + [" <- {"] + joinFragments(self.exprs, "; ") + ["}"]
 class IfElseAstNode(AstNode):
+	__slots__ = ("cond", "trueexprs", "falseexprs", "returns", "label")
 	def __init__(self, cond, trueexprs, falseexprs, returns, label):
 		self.cond = cond
 		self.trueexprs = trueexprs
 		self.falseexprs = falseexprs
 		self.returns = returns
 		self.label = label
-	def __repr__(self):
-		string = ""
+	def fragments(self):
+		parts = []
 		if len(self.returns) != 0:
-			string += ", ".join(map(str, self.returns)) + " <- "
-		string += "if(" + str(self.cond) + ")\n"
-		string += str(self.trueexprs)
+			parts += joinFragments(self.returns, ", ") + [" <- "]
+		parts += ["if(", self.cond, ")\n["] + joinFragments(self.trueexprs, ", ") + ["]"]
 		if self.falseexprs != None:
-			string += "else\n"
-			string += str(self.falseexprs)
-		return string
+			parts += ["else\n["] + joinFragments(self.falseexprs, ", ") + ["]"]
+		return parts
 class LoopAstNode(AstNode):
+	__slots__ = ("exprs", "returns", "label")
 	def __init__(self, exprs, returns, label):
 		self.exprs = exprs
 		self.returns = returns
 		self.label = label
-	def __repr__(self):
+	def fragments(self):
 		if len(self.returns) == 0:
-			return "loop {" + '; '.join(map(str, self.exprs)) + "}"
-		return ", ".join(map(str, self.returns)) + " <- {" + '; '.join(map(str, self.exprs)) + "}"
+			return ["loop {"] + joinFragments(self.exprs, "; ") + ["}"]
+		return joinFragments(self.returns, ", ") + [" <- {"] + joinFragments(self.exprs, "; ") + ["}"]
 class SetAstNode(AstNode):
+	__slots__ = ("toExpr", "fromExpr")
 	def __init__(self, toExpr, fromExpr):
 		self.toExpr = toExpr
 		self.fromExpr = fromExpr
-	def __repr__(self):
-		return "%s %s = %s" % (str(self.toExpr.type), str(self.toExpr), str(self.fromExpr))
+	def fragments(self):
+		return [str(self.toExpr.type), " ", self.toExpr, " = ", self.fromExpr]
 class AstExpr:
 	def __init__(self, astnode, indent = 0):
 		self.astnode = astnode
 		self.indent = indent
 	def __repr__(self):
-		return (" "*(4*self.indent)) + str(self.astnode)
+		return (" "*(4*self.indent)) + astToString(self.astnode)
 
 		
 class DecompilationContext:
@@ -251,31 +315,45 @@ class DecompilationContext:
 			return name
 		else:
 			return self.parentcontext.newVar()
-	def setLocal(self, index, value):
+	def flushLocalReads(self, index, type):
 		for i in range(len(self.stack)):
 			stackentry = self.stack[i]
-			if stackentry.readsLocal(index):
-				var = VarAstNode(self.func.locals[index], context = self)
+			if index in stackentry.localReads:
+				var = VarAstNode(type, context = self)
 				self.evict(SetAstNode(var, stackentry))
 				self.stack[i] = var
-		self.evict(SetAstNode(self.getLocal(index), value))
-		return value
-	def getLocal(self, index):
-		if index < len(self.func.type.parameters):
-			return VarAstNode(self.func.type.parameters[index], name = "arg" + str(index))
-		index = index - len(self.func.type.parameters)
-		return VarAstNode(self.func.locals[index], name = "local" + str(index))
-	def setGlobal(self, index, value):
+	def flushGlobalReads(self, index, type):
+		for i in range(len(self.stack)):
+			stackentry = self.stack[i]
+			if index in stackentry.globalReads:
+				var = VarAstNode(type, context = self)
+				self.evict(SetAstNode(var, stackentry))
+				self.stack[i] = var
+	#a store or a call can change memory, loads still waiting on the stack are evaluated before it
+	def flushMemoryReads(self):
 		for i in range(len(self.stack)):
 			stackentry = self.stack[i]
-			if stackentry.readsLocal(index):
-				var = VarAstNode(self.func.locals[index], context = self)
+			if stackentry.memoryRead:
+				var = VarAstNode(getattr(stackentry, "valtype", None) or stackentry.type, context = self)
 				self.evict(SetAstNode(var, stackentry))
 				self.stack[i] = var
-		self.evict(SetAstNode(self.getGlobal(index), value))
+	def setLocal(self, index, value):
+		local = self.getLocal(index)
+		self.flushLocalReads(index, local.type)
+		self.evict(SetAstNode(local, value))
+		return value
+	def getLocal(self, index):
+		if index < len(self.func.type.parameters):
+			return VarAstNode(self.func.type.parameters[index], name = "arg" + str(index), localindex = index)
+		localindex = index - len(self.func.type.parameters)
+		return VarAstNode(self.func.locals[localindex], name = "local" + str(localindex), localindex = index)
+	def setGlobal(self, index, value):
+		globalVar = self.getGlobal(index)
+		self.flushGlobalReads(index, globalVar.type)
+		self.evict(SetAstNode(globalVar, value))
 	def getGlobal(self, index):
 		globalObj = self.module.globals[index]
-		return VarAstNode(globalObj.type, name = globalObj.name)
+		return VarAstNode(globalObj.type, name = globalObj.name, globalindex = index)
 	def pop(self):
 		return self.stack.pop()
 	def ret(self):
@@ -348,54 +426,136 @@ def returnsToString(returnvalues):
 		return ""
 	return "["+ ", ".join(map(str, returnvalues)) + "] <- "
 
-def printExprs(exprs, indent = 0):
-	for expr in exprs:
+def pushExprs(work, exprs, indent):
+	for i in range(len(exprs) - 1, -1, -1):
+		work.append((exprs[i], indent))
+
+def printExprs(exprs, file, indent = 0):
+	work = []
+	pushExprs(work, exprs, indent)
+	while len(work) != 0:
+		item = work.pop()
+		if type(item) == str:
+			file.writeLine(item)
+			continue
+		expr, indent = item
+		prefix = "    "*indent
 		if type(expr) == BlockAstNode:
-			print("    "*indent + returnsToString(expr.returns) + expr.label + " {")
-			printExprs(expr.exprs, indent + 1)
-			print("    "*indent + "}")
+			file.writeLine(prefix + returnsToString(expr.returns) + expr.label + " {")
+			work.append(prefix + "}")
+			pushExprs(work, expr.exprs, indent + 1)
 		elif type(expr) == IfElseAstNode:
-			print("    "*indent + returnsToString(expr.returns) + expr.label + " if(" + str(expr.cond) + ") {")
-			printExprs(expr.trueexprs, indent + 1)
-			print("    "*indent + "}")
+			file.writeLine(prefix + returnsToString(expr.returns) + expr.label + " if(" + astToString(expr.cond) + ") {")
 			if expr.falseexprs != None:
-				print("    "*indent + "else{")
-				printExprs(expr.falseexprs, indent + 1)
-				print("    "*indent + "}")
+				work.append(prefix + "}")
+				pushExprs(work, expr.falseexprs, indent + 1)
+				work.append(prefix + "else{")
+			work.append(prefix + "}")
+			pushExprs(work, expr.trueexprs, indent + 1)
 		elif type(expr) == LoopAstNode:
-			print("    "*indent + returnsToString(expr.returns) + expr.label + " { //loop-head")
-			printExprs(expr.exprs, indent + 1)
-			print("    "*indent + "}")
+			file.writeLine(prefix + returnsToString(expr.returns) + expr.label + " { //loop-head")
+			work.append(prefix + "}")
+			pushExprs(work, expr.exprs, indent + 1)
 		else:
-			print("    "*indent + str(expr))
+			file.writeLine(prefix + astToString(expr))
 
 def decompileWasmFunction(module, function, file):
-	print("")
-	print("")
-	print("Decompiling function")
-	print(function)
+	file.writeLine()
+	file.writeLine()
+	file.writeLine("Decompiling function")
+	file.writeLine(str(function))
+	profiler = Profile.profiler
+	#a lazy body is decoded before the clock starts, so its parse time is not counted as decompilation
+	expr = function.expr
+	if profiler != None:
+		entry = profiler.function(function)
+		start = time.perf_counter()
+		blocks = sys.getallocatedblocks()
 	context = DecompilationContext(module, function)
-	decompileExpr(context, function.expr)
+	decompileExpr(context, expr)
 	context.ret()
-	print("------------------------")
-	print("Final Result: {")
-	printExprs(context.exprs, 1)
-	print("}")
+	if profiler != None:
+		entry.decompile += time.perf_counter() - start
+		start = time.perf_counter()
+	file.writeLine("------------------------")
+	file.writeLine("Final Result: {")
+	printExprs(context.exprs, file, 1)
+	file.writeLine("}")
+	if profiler != None:
+		entry.render += time.perf_counter() - start
+		entry.allocations += sys.getallocatedblocks() - blocks
 
-def decompileWasmModule(module, file):
+def decompileWasmHeader(module, file):
 	for glob in module.globals:
-		file.write(glob.printExpr(module))
-		file.write("\n")
-	file.write("\n")
+		file.writeLine(glob.printExpr(module))
+	file.writeLine()
 	for mem in module.memories:
-		file.write(mem.printExpr(module))
-		file.write("\n")
-	file.write("\n")
+		file.writeLine(mem.printExpr(module))
+	file.writeLine()
 	for table in module.tables:
-		file.write(table.printExpr(module))
-		file.write("\n")
-	file.write("\n")
-	for func in module.functions:
-		if not func._import:
+		file.writeLine(table.printExpr(module))
+	file.writeLine()
+	for custom in module.customs:
+		file.writeLine(custom.printExpr(module))
+	file.writeLine()
+
+#with data, imported functions that no body calls are marked and the instructions of all bodies are counted
+def printInventory(module, file, data = None):
+	called = None
+	if data != None:
+		called = set(func.id for func in calledImports(module, data))
+	for import_module in module.import_modules.values():
+		for sym, target in import_module.items():
+			line = "import " + import_module.name + "." + sym + ": " + repr(target)
+			if called != None and type(target) == Function and target.id not in called:
+				line += " (unused)"
+			file.writeLine(line)
+	for export in module.exports:
+		file.writeLine("export " + export.name + ": " + repr(export.target))
+	if data != None:
+		file.writeLine(str(countInstructions(module, data)) + " instructions in " + str(len(module.code_index)) + " function bodies")
+
+def decompileWasmModule(module, file, functions = None, cache = None, progress = None):
+	if functions == None:
+		decompileWasmHeader(module, file)
+		functions = module.functions
+	for func in functions:
+		if func._import:
+			continue
+		loader = func.loader
+		if cache != None:
+			cache.decompileWasmFunction(module, func, file)
+		else:
 			decompileWasmFunction(module, func, file)
-	
+		if loader != None:
+			releaseFunctionBody(func, loader)
+		if progress != None:
+			progress.update()
+
+#a lazily parsed body goes back to its loader, it is decoded again when needed
+def releaseFunctionBody(func, loader = None):
+	func.locals = []
+	func.expr = None
+	func.loader = loader
+
+def iterDecompiledFunctions(module, functions = None, render = True, release = False):
+	if functions == None:
+		functions = module.functions
+	for func in functions:
+		if func._import:
+			continue
+		loader = func.loader
+		if render:
+			output = MemoryWriter()
+			decompileWasmFunction(module, func, output)
+			result = output.getvalue()
+		else:
+			context = DecompilationContext(module, func)
+			decompileExpr(context, func.expr)
+			context.ret()
+			result = context.exprs
+		yield func, result
+		result = None
+		#eagerly parsed bodies can not be decoded again, so they are only dropped on request
+		if loader != None or release:
+			releaseFunctionBody(func, loader)
\ No newline at end of file
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+#
+
+import struct
+from array import array
+
+from Type import ValType
+from Leb128 import *
+
+#kinds of immediates following an opcode
+IMM_NONE = 0
+IMM_U32 = 1
+IMM_U32_U32 = 2
+IMM_BLOCK = 3
+IMM_BRTABLE = 4
+IMM_SLEB = 5
+IMM_F32 = 6
+IMM_F64 = 7
+IMM_U32_BYTE = 8
+IMM_BYTE = 9
+IMM_INVALID = 0xFF
+
+immediateKinds = bytearray([IMM_INVALID]) * 256
+for opcode in [0x00, 0x01, 0x05, 0x0B, 0x0F, 0x1A, 0x1B] + list(range(0x45, 0xC0)):
+	immediateKinds[opcode] = IMM_NONE
+for opcode in (0x02, 0x03, 0x04):
+	immediateKinds[opcode] = IMM_BLOCK
+for opcode in (0x0C, 0x0D, 0x10, 0x20, 0x21, 0x22, 0x23, 0x24):
+	immediateKinds[opcode] = IMM_U32
+for opcode in range(0x28, 0x3F):
+	immediateKinds[opcode] = IMM_U32_U32
+immediateKinds[0x0E] = IMM_BRTABLE
+immediateKinds[0x11] = IMM_U32_BYTE
+immediateKinds[0x3F] = IMM_BYTE
+immediateKinds[0x40] = IMM_BYTE
+immediateKinds[0x41] = IMM_SLEB
+immediateKinds[0x42] = IMM_SLEB
+immediateKinds[0x43] = IMM_F32
+immediateKinds[0x44] = IMM_F64
+
+#a function body as parallel columns, structured instructions know the index of their matching end
+class FlatBody:
+	__slots__ = ("locals", "opcodes", "imm1", "imm2", "ends", "branchTables")
+	def __init__(self):
+		self.locals = []
+		self.opcodes = array('I')
+		self.imm1 = array('q')
+		self.imm2 = array('q')
+		self.ends = array('I')
+		self.branchTables = []
+	def __len__(self):
+		return len(self.opcodes)
+	#else and end only delimit blocks, like the instruction tree they are not counted
+	def instructionCount(self):
+		opcodes = self.opcodes
+		return len(opcodes) - opcodes.count(0x05) - opcodes.count(0x0B)
+	def calls(self):
+		imm1 = self.imm1
+		return [imm1[i] for i in range(len(self.opcodes)) if self.opcodes[i] == 0x10]
+	def __repr__(self):
+		return "FlatBody(" + str(len(self.opcodes)) + " instructions)"
+
+def decodeFlatBody(data, start, end):
+	body = FlatBody()
+	offset = start
+	count, offset = readULEB128(data, offset)
+	for i in range(count):
+		repeat, offset = readULEB128(data, offset)
+		body.locals.extend(repeat * [ValType(data[offset])])
+		offset += 1
+
+	opcodes = body.opcodes
+	imm1 = body.imm1
+	imm2 = body.imm2
+	ends = body.ends
+	openBlocks = []
+	openElses = dict()
+	index = 0
+	while offset < end:
+		opcode = data[offset]
+		offset += 1
+		kind = immediateKinds[opcode]
+		first = 0
+		second = 0
+		if kind == IMM_NONE:
+			pass
+		elif kind == IMM_U32:
+			first, offset = readULEB128(data, offset)
+		elif kind == IMM_U32_U32:
+			first, offset = readULEB128(data, offset)
+			second, offset = readULEB128(data, offset)
+		elif kind == IMM_BLOCK:
+			first = data[offset]
+			offset += 1
+		elif kind == IMM_BRTABLE:
+			table, offset = readULEB128Vector(data, offset)
+			first = len(body.branchTables)
+			body.branchTables.append(table)
+			second, offset = readULEB128(data, offset)
+		elif kind == IMM_SLEB:
+			first, offset = readSLEB128(data, offset)
+		elif kind == IMM_F32:
+			first = struct.unpack_from("<i", data, offset)[0]
+			offset += 4
+		elif kind == IMM_F64:
+			first = struct.unpack_from("<q", data, offset)[0]
+			offset += 8
+		elif kind == IMM_U32_BYTE:
+			first, offset = readULEB128(data, offset)
+			second = data[offset]
+			offset += 1
+		elif kind == IMM_BYTE:
+			first = data[offset]
+			offset += 1
+		else:
+			raise ValueError("Unknown opcode 0x%02X at offset %d" % (opcode, offset - 1))
+		opcodes.append(opcode)
+		imm1.append(first)
+		imm2.append(second)
+		ends.append(0)
+		if kind == IMM_BLOCK:
+			openBlocks.append(index)
+		elif opcode == 0x05:
+			openElses[openBlocks[-1]] = index
+		elif opcode == 0x0B:
+			#the final end of the body closes the function itself
+			if len(openBlocks) != 0:
+				opener = openBlocks.pop()
+				ends[opener] = index
+				ends[index] = opener
+				if opener in openElses:
+					ends[openElses.pop(opener)] = index
+		index += 1
+	assert offset == end
+	return body
+
+def decodeFlatBodies(module, data):
+	bodies = dict()
+	for func_id, (start, end) in module.code_index.items():
+		bodies[func_id] = decodeFlatBody(data, start, end)
+	return bodies
+
+def buildCallGraph(module, data):
+	graph = dict()
+	for func_id, body in decodeFlatBodies(module, data).items():
+		graph[func_id] = sorted(set(body.calls()))
+	return graph
+
+def countInstructions(module, data):
+	return sum(body.instructionCount() for body in decodeFlatBodies(module, data).values())
+
+def calledImports(module, data):
+	imported = set(func.id for func in module.functions if func._import)
+	called = set()
+	for callees in buildCallGraph(module, data).values():
+		called.update(callee for callee in callees if callee in imported)
+	return [module.functions[func_id] for func_id in sorted(called)]
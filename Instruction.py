@@ -6,22 +6,25 @@ from enum import Enum
 
 
 class Instruction:
+	__slots__ = ()
 	def doDecomp(self, context):
-		print(type(self))
-		assert False
+		assert False, "Decompilation of " + type(self).__name__ + " is not implemented"
 	def __repr__(self):
 		return "undef"
 class UnreachableInstruction(Instruction):
+	__slots__ = ()
 	def doDecomp(self, context):
 		context.evict(UnreachableAstNode())
 	def __repr__(self):
 		return "Unreachable"
 class NopInstruction(Instruction):
+	__slots__ = ()
 	def doDecomp(self, context):
 		pass
 	def __repr__(self):
 		return "Nop"
 class StoreInstruction(Instruction):
+	__slots__ = ("valtype", "length", "align", "offset")
 	def __init__(self, valtype, length, align, offset):
 		self.valtype = valtype
 		self.length = length
@@ -30,10 +33,12 @@ class StoreInstruction(Instruction):
 	def doDecomp(self, context):
 		value = context.pop()
 		ptr = context.pop()
+		context.flushMemoryReads()
 		context.evict(StoreAstNode(self.valtype, ptr, self.length, self.align, self.offset, value))
 	def __repr__(self):
 		return "Store[]"
 class LoadInstruction(Instruction):
+	__slots__ = ("valtype", "s_ext", "length", "align", "offset")
 	def __init__(self, valtype, s_ext, length, align, offset):
 		self.valtype = valtype
 		self.s_ext = s_ext
@@ -94,6 +99,7 @@ wasm_op_dispatcher = {
 		}
 		
 class OpInstruction(Instruction):
+	__slots__ = ("type", "valtype", "signed")
 	def __init__(self, type, valtype, signed = False):
 		self.type = type
 		self.valtype = valtype
@@ -103,6 +109,7 @@ class OpInstruction(Instruction):
 	def __repr__(self):
 		return "Op " + str(self.type)
 class ConstInstruction(Instruction):
+	__slots__ = ("valtype", "value")
 	def __init__(self, valtype, value):
 		self.valtype = valtype
 		self.value = value
@@ -111,6 +118,7 @@ class ConstInstruction(Instruction):
 	def __repr__(self):
 		return "Const %d" % self.value
 class MemSizeInstruction(Instruction):
+	__slots__ = ("size",)
 	def __init__(self, size):
 		self.size = size
 	def doDecomp(self, context):
@@ -118,6 +126,7 @@ class MemSizeInstruction(Instruction):
 	def __repr__(self):
 		return "MemSize" % self.value
 class MemGrowInstruction(Instruction):
+	__slots__ = ("size",)
 	def __init__(self, size):
 		self.size = size
 	def doDecomp(self, context):
@@ -125,6 +134,7 @@ class MemGrowInstruction(Instruction):
 	def __repr__(self):
 		return "MemGrow %d" % self.value
 class CastInstruction(Instruction):
+	__slots__ = ("fromtype", "totype", "signed")
 	def __init__(self, fromtype, totype, signed = False):
 		self.fromtype = fromtype
 		self.totype = totype
@@ -134,6 +144,7 @@ class CastInstruction(Instruction):
 	def __repr__(self):
 		return "Cast"
 class ReinterpretInstruction(Instruction):
+	__slots__ = ("fromtype", "totype")
 	def __init__(self, fromtype, totype):
 		self.fromtype = fromtype
 		self.totype = totype
@@ -142,6 +153,7 @@ class ReinterpretInstruction(Instruction):
 	def __repr__(self):
 		return "Reinterpret"
 class BranchInstruction(Instruction):
+	__slots__ = ("label", "condition")
 	def __init__(self, label, condition = True):
 		self.label = label
 		self.condition = condition
@@ -153,6 +165,7 @@ class BranchInstruction(Instruction):
 	def __repr__(self):
 		return "Branch" + ("If" if self.condition else "")
 class BranchTableInstruction(Instruction):
+	__slots__ = ("label", "table")
 	def __init__(self, table, label):
 		self.label = label
 		self.table = table
@@ -162,11 +175,13 @@ class BranchTableInstruction(Instruction):
 	def __repr__(self):
 		return "BranchTable"
 class ReturnInstruction(Instruction):
+	__slots__ = ()
 	def doDecomp(self, context):
 		context.ret()
 	def __repr__(self):
 		return "Return"
 class CallInstruction(Instruction):
+	__slots__ = ("target", "type")
 	def __init__(self, target = None, type = None):
 		self.target = target
 		if target != None:
@@ -178,20 +193,24 @@ class CallInstruction(Instruction):
 			assert False
 	def doDecomp(self, context):
 		callnode = CallAstNode(context, self.target, self.type)
+		context.flushMemoryReads()
 		for retvar in callnode.rets[::-1]:
 			context.push(retvar)
 		context.evict(callnode)
 	def __repr__(self):
 		return "Call " + str(self.target) + " " + str(self.type)
 class DropInstruction(Instruction):
+	__slots__ = ()
 	def doDecomp(self, context):
 		context.pop()
 	def __repr__(self):
 		return "Drop"
 class SelectInstruction(Instruction):
+	__slots__ = ()
 	def __repr__(self):
 		return "Select"
 class GetLocalInstruction(Instruction):
+	__slots__ = ("index",)
 	def __init__(self, index):
 		self.index = index
 	def doDecomp(self, context):
@@ -199,6 +218,7 @@ class GetLocalInstruction(Instruction):
 	def __repr__(self):
 		return "get_local.%d" % self.index
 class SetLocalInstruction(Instruction):
+	__slots__ = ("index",)
 	def __init__(self, index):
 		self.index = index
 	def doDecomp(self, context):
@@ -206,6 +226,7 @@ class SetLocalInstruction(Instruction):
 	def __repr__(self):
 		return "set_local.%d" % self.index
 class TeeLocalInstruction(SetLocalInstruction):
+	__slots__ = ()
 	def __init__(self, index):
 		self.index = index
 	def doDecomp(self, context):
@@ -214,6 +235,7 @@ class TeeLocalInstruction(SetLocalInstruction):
 	def __repr__(self):
 		return "tee_local.%d" % self.index
 class GetGlobalInstruction(Instruction):
+	__slots__ = ("index",)
 	def __init__(self, index):
 		self.index = index
 	def doDecomp(self, context):
@@ -221,6 +243,7 @@ class GetGlobalInstruction(Instruction):
 	def __repr__(self):
 		return "get_global.%d" % self.index
 class SetGlobalInstruction(Instruction):
+	__slots__ = ("index",)
 	def __init__(self, index):
 		self.index = index
 	def doDecomp(self, context):
@@ -229,6 +252,7 @@ class SetGlobalInstruction(Instruction):
 		return "set_global.%d" % self.index
 		
 class BlockInstruction(Instruction):
+	__slots__ = ("blocktype", "expr")
 	def __init__(self, blocktype, expr):
 		self.blocktype = blocktype
 		self.expr = expr
@@ -237,6 +261,7 @@ class BlockInstruction(Instruction):
 	def __repr__(self):
 		return "block -> " + str(self.blocktype)
 class IfElseInstruction(Instruction):
+	__slots__ = ("blocktype", "expr", "altexpr")
 	def __init__(self, blocktype, expr, altexpr = None):
 		self.blocktype = blocktype
 		self.expr = expr
@@ -247,6 +272,7 @@ class IfElseInstruction(Instruction):
 	def __repr__(self):
 		return "if-else"
 class LoopInstruction(Instruction):
+	__slots__ = ("blocktype", "expr")
 	def __init__(self, blocktype, expr):
 		self.blocktype = blocktype
 		self.expr = expr
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+
+def readULEB128(data, offset):
+	byte = data[offset]
+	if byte < 0x80:
+		return byte, offset + 1
+	byte2 = data[offset + 1]
+	if byte2 < 0x80:
+		return (byte & 0x7f) | (byte2 << 7), offset + 2
+	result = (byte & 0x7f) | ((byte2 & 0x7f) << 7)
+	shift = 14
+	offset += 2
+	while True:
+		byte = data[offset]
+		offset += 1
+		result |= (byte & 0x7f) << shift
+		if byte < 0x80:
+			return result, offset
+		shift += 7
+
+#works for i32 and i64 alike, the sign bit is always bit 6 of the last byte
+def readSLEB128(data, offset):
+	byte = data[offset]
+	if byte < 0x80:
+		return (byte - 0x80 if byte & 0x40 else byte), offset + 1
+	byte2 = data[offset + 1]
+	if byte2 < 0x80:
+		result = (byte & 0x7f) | (byte2 << 7)
+		return (result - 0x4000 if byte2 & 0x40 else result), offset + 2
+	result = (byte & 0x7f) | ((byte2 & 0x7f) << 7)
+	shift = 14
+	offset += 2
+	while True:
+		byte = data[offset]
+		offset += 1
+		result |= (byte & 0x7f) << shift
+		shift += 7
+		if byte < 0x80:
+			break
+	if byte & 0x40:
+		result -= 1 << shift
+	return result, offset
+
+def readULEB128Vector(data, offset):
+	count, offset = readULEB128(data, offset)
+	values = [0] * count
+	for i in range(count):
+		byte = data[offset]
+		if byte < 0x80:
+			values[i] = byte
+			offset += 1
+		else:
+			values[i], offset = readULEB128(data, offset)
+	return values, offset
+
+def writeULEB128(value):
+	out = bytearray()
+	while True:
+		byte = value & 0x7f
+		value >>= 7
+		if value == 0:
+			out.append(byte)
+			return bytes(out)
+		out.append(byte | 0x80)
+
+def writeSLEB128(value):
+	out = bytearray()
+	while True:
+		byte = value & 0x7f
+		value >>= 7
+		if (value == 0 and not byte & 0x40) or (value == -1 and byte & 0x40):
+			out.append(byte)
+			return bytes(out)
+		out.append(byte | 0x80)
@@ -1,12 +1,42 @@
 #!/usr/bin/env python3
 #
 
+import re
+
+from Type import ExportDescrType
+
 class ImportModule(dict):
 	def __init__(self, name):
 		self.name = name
 	def __repr__(self):
 		return self.name + " " + super().__repr__()
 	
+class Export:
+	def __init__(self, name, type, target):
+		self.name = name
+		self.type = type
+		self.target = target
+	def __repr__(self):
+		return "Export " + self.name + " " + str(self.type)
+
+class Section:
+	def __init__(self, type, offset, size):
+		self.type = type
+		self.offset = offset
+		self.size = size
+	def __repr__(self):
+		return "Section " + str(self.type) + " at " + str(self.offset) + " (" + str(self.size) + " bytes)"
+
+class CustomSection:
+	def __init__(self, name, payload, position = None):
+		self.name = name
+		self.payload = payload
+		self.position = position
+	def printExpr(self, module):
+		return "Custom " + self.name + " (" + str(len(self.payload)) + " bytes)"
+	def __repr__(self):
+		return "Custom " + self.name
+
 class Module:
 	def __init__(self):
 		self.functions = []
@@ -15,6 +45,9 @@ class Module:
 		self.memories = []
 		self.exports = []
 		self.globals = []
+		self.customs = []
+		self.sections = []
+		self.code_index = dict()
 		self.custom_func_offset = 0
 		self.custom_clobal_offset = 0
 		self.start_func = -1
@@ -26,6 +59,33 @@ class Module:
 		self.import_modules[import_module_id] = ImportModule(import_module_id)
 		return self.import_modules[import_module_id]
 
+	def get_export(self, name):
+		for export in self.exports:
+			if export.name == name:
+				return export
+		return None
+
+	def find_functions(self, indices = [], export_names = [], patterns = []):
+		selected = set()
+		for index in indices:
+			if index < 0 or index >= len(self.functions):
+				raise KeyError("No function with index " + str(index))
+			selected.add(index)
+		for name in export_names:
+			export = self.get_export(name)
+			if export == None or export.type != ExportDescrType.FUNC:
+				raise KeyError("No exported function " + name)
+			selected.add(export.target.id)
+		for pattern in patterns:
+			regex = re.compile(pattern)
+			for func in self.functions:
+				if regex.search(func.name):
+					selected.add(func.id)
+			for export in self.exports:
+				if export.type == ExportDescrType.FUNC and regex.search(export.name):
+					selected.add(export.target.id)
+		return [self.functions[index] for index in sorted(selected)]
+
 	def __str__(self):
 		return str(self.functions) + str(self.import_modules)
 
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+#
+
+import io
+import os
+import pickle
+import hashlib
+import tempfile
+from array import array
+
+from Parser import *
+from Decomp import *
+from Output import *
+
+#the cache key covers the sources of everything that ends up in a pickled module or a rendered function, so any change to them invalidates old entries
+cachedSources = ("Parser.py", "Module.py", "Type.py", "Instruction.py", "Decomp.py", "Output.py", "Leb128.py", "FlatIR.py", "ModuleCache.py")
+
+def toolVersion():
+	digest = hashlib.sha256()
+	directory = os.path.dirname(os.path.abspath(__file__))
+	for source in cachedSources:
+		with open(os.path.join(directory, source), "rb") as file:
+			digest.update(file.read())
+	return digest.hexdigest()
+
+def smallestTypecode(maximum):
+	for typecode in ('B', 'H', 'I'):
+		if maximum < 1 << (8 * array(typecode).itemsize):
+			return typecode
+	return 'Q'
+
+#stand-ins pickled in place of objects that are rebuilt from the current input, only ModuleUnpickler resolves them
+def cachedFunction(index):
+	raise pickle.UnpicklingError("cached modules are loaded with a ModuleUnpickler")
+def cachedView(position, length):
+	raise pickle.UnpicklingError("cached modules are loaded with a ModuleUnpickler")
+
+#an entry is three pickles sharing one memo: the function types, the function columns and the rest of the module.
+#functions are stored as columns of type ids and code offsets, references to them and views into the input as indices
+class ModulePickler(pickle.Pickler):
+	def __init__(self, file, module):
+		super().__init__(file, pickle.HIGHEST_PROTOCOL)
+		self.views = dict()
+		for memory in module.memories:
+			for init_range in memory.init_list:
+				if type(init_range) == DataInitRange:
+					self.views[id(init_range.values)] = (init_range.position, init_range.length)
+		for custom in module.customs:
+			self.views[id(custom.payload)] = (custom.position, len(custom.payload))
+		self.dispatch_table = {
+			Function: lambda func: (cachedFunction, (func.id,)),
+			memoryview: lambda view: (cachedView, self.views[id(view)]),
+		}
+	def dumpModule(self, module):
+		typeIds = {id(func_type): index for index, func_type in enumerate(module.func_types)}
+		types = array(smallestTypecode(len(module.func_types)), [typeIds[id(func.type)] for func in module.functions])
+		names = {func.id: func.name for func in module.functions if func.name != "func" + str(func.id)}
+		imports = len([func for func in module.functions if func._import])
+		#a module may have no code section, only the functions with a body range have one to load
+		bodies = array(smallestTypecode(len(module.functions)), sorted(module.code_index))
+		code = array(smallestTypecode(max((end for start, end in module.code_index.values()), default = 0)))
+		for func_id in bodies:
+			code.extend(module.code_index[func_id])
+		header = dict(module.__dict__)
+		del header["functions"], header["code_index"]
+		self.dump(module.func_types)
+		self.dump((types, names, imports, bodies, code))
+		self.dump(header)
+
+class ModuleUnpickler(pickle.Unpickler):
+	def __init__(self, file, wasmparser):
+		super().__init__(file)
+		self.wasmparser = wasmparser
+		self.functions = []
+	def find_class(self, moduleName, name):
+		if moduleName == __name__ and name == "cachedFunction":
+			return self.functions.__getitem__
+		elif moduleName == __name__ and name == "cachedView":
+			return self.view
+		return super().find_class(moduleName, name)
+	def view(self, position, length):
+		return self.wasmparser.parser.data[position:position + length]
+	def loadModule(self):
+		func_types = self.load()
+		types, names, imports, bodies, code = self.load()
+		functions = self.functions
+		functionNames = ["func" + str(index) for index in range(len(types))]
+		for index, name in names.items():
+			functionNames[index] = name
+		functions.extend(map(Function, range(len(types)), map(func_types.__getitem__, types), functionNames))
+		for func in functions[:imports]:
+			func._import = True
+		module = Module()
+		module.__dict__.update(self.load())
+		module.functions = functions
+		module.code_index = dict(zip(bodies, zip(code[0::2], code[1::2])))
+		for func_id in bodies:
+			functions[func_id].loader = self.wasmparser
+		for export in module.exports:
+			export.target.export = True
+		return module
+
+class DiskCache:
+	def __init__(self, directory, maxSize = 1 << 30, suffix = ".cache"):
+		self.directory = directory
+		self.maxSize = maxSize
+		self.suffix = suffix
+		self.version = toolVersion()
+		#estimated size of the directory, other processes may add to it so eviction always rescans
+		self.size = None
+		os.makedirs(directory, exist_ok = True)
+	def path(self, key):
+		return os.path.join(self.directory, key + self.suffix)
+	def get(self, key):
+		path = self.path(key)
+		try:
+			with open(path, "rb") as file:
+				data = file.read()
+		except FileNotFoundError:
+			return None
+		try:
+			os.utime(path)
+		except FileNotFoundError:
+			pass
+		return data
+	def put(self, key, data):
+		#write to a private file first, the rename makes the entry appear atomically for other processes
+		handle, temppath = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+		with os.fdopen(handle, "wb") as file:
+			file.write(data)
+		os.replace(temppath, self.path(key))
+		if self.size == None:
+			self.evict()
+		else:
+			self.size += len(data)
+			if self.size > self.maxSize:
+				self.evict()
+	def evict(self):
+		entries = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(self.suffix):
+				continue
+			try:
+				stat = os.stat(os.path.join(self.directory, name))
+			except FileNotFoundError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, name))
+		total = sum(entry[1] for entry in entries)
+		for mtime, size, name in sorted(entries):
+			if total <= self.maxSize:
+				break
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except FileNotFoundError:
+				pass
+			total -= size
+		self.size = total
+
+class ModuleCache(DiskCache):
+	def __init__(self, directory, maxSize = 1 << 30):
+		super().__init__(directory, maxSize, ".module")
+	def key(self, parser):
+		digest = hashlib.sha256(self.version.encode())
+		digest.update(parser.data)
+		return digest.hexdigest()
+	def load(self, parser):
+		data = self.get(self.key(parser))
+		if data == None:
+			return None
+		wasmparser = WasmParser(parser, lazy = True)
+		wasmparser.module = ModuleUnpickler(io.BytesIO(data), wasmparser).loadModule()
+		return wasmparser.module
+	def store(self, parser, wasmparser, module):
+		output = io.BytesIO()
+		ModulePickler(output, module).dumpModule(module)
+		self.put(self.key(parser), output.getvalue())
+	def parseWasm(self, parser):
+		module = self.load(parser)
+		if module != None:
+			return module
+		wasmparser = WasmParser(parser, lazy = True)
+		module = wasmparser.parseWasm()
+		self.store(parser, wasmparser, module)
+		return module
+
+#rendered functions are keyed by their body and everything outside of it that shows up in the output
+class FunctionCache(DiskCache):
+	def __init__(self, directory, data, maxSize = 1 << 30):
+		super().__init__(directory, maxSize, ".func")
+		self.data = data
+	def key(self, module, func):
+		start, end = module.code_index[func.id]
+		digest = hashlib.sha256(self.version.encode())
+		digest.update(str(func).encode())
+		digest.update(self.data[start:end])
+		body = decodeFlatBody(self.data, start, end)
+		for i in range(len(body)):
+			opcode = body.opcodes[i]
+			if opcode == 0x10:
+				callee = module.functions[body.imm1[i]]
+				digest.update(("call " + callee.name + str(callee.type)).encode())
+			elif opcode == 0x11:
+				digest.update(("call_indirect " + str(module.func_types[body.imm1[i]])).encode())
+			elif opcode == 0x23 or opcode == 0x24:
+				globalObj = module.globals[body.imm1[i]]
+				digest.update(("global " + str(globalObj.name) + str(globalObj.type)).encode())
+		return digest.hexdigest()
+	def decompileWasmFunction(self, module, func, file):
+		key = self.key(module, func)
+		data = self.get(key)
+		if data != None:
+			file.write(data.decode("utf-8"))
+			return
+		output = MemoryWriter()
+		decompileWasmFunction(module, func, output)
+		text = output.getvalue()
+		self.put(key, text.encode("utf-8"))
+		file.write(text)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+#
+
+import io
+import sys
+
+class OutputWriter:
+	def __init__(self, stream, bufferSize = 1 << 16, closeStream = False):
+		self.stream = stream
+		self.bufferSize = bufferSize
+		self.closeStream = closeStream
+		self.parts = []
+		self.size = 0
+	def write(self, string):
+		self.parts.append(string)
+		self.size += len(string)
+		if self.size >= self.bufferSize:
+			self.flush()
+	def writeLine(self, string = ""):
+		self.write(string)
+		self.write("\n")
+	def flush(self):
+		if len(self.parts) != 0:
+			self.stream.write("".join(self.parts))
+			self.parts = []
+			self.size = 0
+		self.stream.flush()
+	def close(self):
+		self.flush()
+		if self.closeStream:
+			self.stream.close()
+	def __enter__(self):
+		return self
+	def __exit__(self, *exc):
+		self.close()
+
+class MemoryWriter(OutputWriter):
+	def __init__(self):
+		super().__init__(io.StringIO(), bufferSize = 0)
+	def write(self, string):
+		self.stream.write(string)
+	def getvalue(self):
+		return self.stream.getvalue()
+
+def openWriter(filename = None, bufferSize = 1 << 16):
+	if filename == None or filename == "-":
+		return OutputWriter(sys.stdout, bufferSize)
+	return OutputWriter(open(filename, "w"), bufferSize, closeStream = True)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#
+
+import multiprocessing
+
+from Parser import *
+from Decomp import *
+from Output import *
+from ModuleCache import FunctionCache
+
+#state of a worker process, every worker maps and indexes the module once
+workerModule = None
+workerParser = None
+workerCache = None
+
+def initWorker(filename, cacheDirectory = None, cacheSize = 1 << 30):
+	global workerModule, workerParser, workerCache
+	file = open(filename, "rb")
+	workerParser = WasmParser(mapFile(file), lazy = True)
+	workerModule = workerParser.parseWasm()
+	if cacheDirectory != None:
+		workerCache = FunctionCache(cacheDirectory, workerParser.parser.data, cacheSize)
+
+def decompileRanges(ranges):
+	results = []
+	for func_id, body_range in ranges:
+		func = workerModule.functions[func_id]
+		workerModule.code_index[func_id] = body_range
+		func.loader = workerParser
+		output = MemoryWriter()
+		if workerCache != None:
+			workerCache.decompileWasmFunction(workerModule, func, output)
+		else:
+			decompileWasmFunction(workerModule, func, output)
+		#drop the body again so a worker only holds the function it is working on
+		func.locals = []
+		func.expr = None
+		results.append(output.getvalue())
+	return results
+
+#the cache is opened again in every worker on its own mapping of the file, entries are shared through the directory
+def decompileWasmModuleParallel(filename, module, file, jobs, functions = None, chunksize = 16, progress = None, cache = None):
+	if functions == None:
+		decompileWasmHeader(module, file)
+		functions = module.functions
+	ranges = [(func.id, module.code_index[func.id]) for func in functions if not func._import]
+	chunks = [ranges[i:i + chunksize] for i in range(0, len(ranges), chunksize)]
+	initargs = (filename,) if cache == None else (filename, cache.directory, cache.maxSize)
+	with multiprocessing.Pool(jobs, initWorker, initargs) as pool:
+		for results in pool.imap(decompileRanges, chunks):
+			for result in results:
+				file.write(result)
+			if progress != None:
+				progress.update(len(results))
@@ -1,193 +1,87 @@
 #!/usr/bin/env python3
 #
 
+import os
 import sys
+import stat
 import struct
+import mmap
+import time
+import logging
 from enum import Enum
 
 from Instruction import *
 from Type import *
 from Module import *
+from Leb128 import *
+from FlatIR import decodeFlatBody
+import Profile
 
 
-class StringParser:
+logger = logging.getLogger(__name__)
+
+class BufferParser:
 	def __init__(self, data):
-		self.data = data
+		self.data = memoryview(data).cast('B')
 		self.position = 0
-	def pop(self, count = 1):
+		self.size = len(self.data)
+	def read_u8(self):
+		try:
+			value = self.data[self.position]
+		except IndexError:
+			raise ParseException() from None
+		self.position += 1
+		return value
+	def read_bytes(self, count):
+		if self.position + count > self.size:
+			raise ParseException()
 		data = self.data[self.position:self.position + count]
 		self.position += count
 		return data
-	def peek(self, count = 1):
-		return self.data[self.position:self.position + count]
+	def peek_u8(self):
+		if self.position >= self.size:
+			return -1
+		return self.data[self.position]
+	def eof(self):
+		return self.position >= self.size
+	def skip(self, count):
+		self.position += count
 	def revert(self, count = 1):
 		self.position -= count
 
 class ParseException(Exception):
 	pass
 
+#pipes and other special files report no size and can not be mapped, they are read instead
+def mapFile(file):
+	status = os.fstat(file.fileno())
+	if not stat.S_ISREG(status.st_mode):
+		return BufferParser(file.read())
+	if status.st_size == 0:
+		return BufferParser(b"")
+	try:
+		return BufferParser(mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ))
+	except (OSError, ValueError):
+		return BufferParser(file.read())
 
-def get_leb128(content):
-	value = 0
-	
-	mask=[0xffffff80,0xffffc000,0xffe00000,0xf0000000,0]
-	bitmask=[0x40,0x40,0x40,0x40,0x8]
-	value = 0
-	for i in range(len(content)):
-		tmp = ord(content[i]) & 0x7f
-		value = tmp << (i * 7) | value
-		if (ord(content[i]) & 0x80) != 0x80:
-			if bitmask[i] & tmp:
-				value |= mask[i]
-			break
-	if i == 4 and (tmp & 0xf0) != 0:
-		print("parse a error uleb128 number")
-		return -1
-	buffer = struct.pack("I",value)
-	value, =struct.unpack("i",buffer)
-	return i+1, value
 
-	
 class WasmParser:
-	def __init__(self, parser):
+	def __init__(self, parser, lazy = False):
 		self.parser = parser
-
-		self.instructionHaldlers = {
-			0x00:lambda:UnreachableInstruction(), 0x01:lambda:NopInstruction(), 0x02:self.parseBlock, 0x03:self.parseLoop, 0x04:self.parseIf,
-			0x0C:lambda:BranchInstruction(self.parseUVal()),
-			0x0D:lambda:BranchInstruction(self.parseUVal(), True),
-			0x0E:lambda:BranchTableInstruction(self.parseVector(parseUVal), self.parseUVal()),
-			0x0F:lambda:ReturnInstruction(),
-			0x10:lambda:CallInstruction(target = self.parseFuncId()),
-			0x11:self.parseCallInd,
-			0x1A:lambda:DropInstruction(),
-			0x1B:lambda:SelectInstruction(),
-			0x20:lambda:GetLocalInstruction(self.parseUVal()),
-			0x21:lambda:SetLocalInstruction(self.parseUVal()),
-			0x22:lambda:TeeLocalInstruction(self.parseUVal()),
-			0x23:lambda:GetGlobalInstruction(self.parseUVal()),
-			0x24:lambda:SetGlobalInstruction(self.parseUVal()),
-			0x28:lambda:LoadInstruction(ValType.I32, False, 32, self.parseUVal(), self.parseUVal()), 0x29:lambda:LoadInstruction(ValType.I64, False, 64, self.parseUVal(), self.parseUVal()),
-			0x2A:lambda:LoadInstruction(ValType.F32, False, 32, self.parseUVal(), self.parseUVal()), 0x2B:lambda:LoadInstruction(ValType.F64, False, 64, self.parseUVal(), self.parseUVal()),
-
-			0x2C:lambda:LoadInstruction(ValType.I32, True, 8, self.parseUVal(), self.parseUVal()), 0x2D:lambda:LoadInstruction(ValType.I32, False, 8, self.parseUVal(), self.parseUVal()),
-			0x2E:lambda:LoadInstruction(ValType.I32, True, 16, self.parseUVal(), self.parseUVal()), 0x2F:lambda:LoadInstruction(ValType.I32, False, 16, self.parseUVal(), self.parseUVal()),
-			0x30:lambda:LoadInstruction(ValType.I64, True, 8, self.parseUVal(), self.parseUVal()), 0x31:lambda:LoadInstruction(ValType.I64, False, 8, self.parseUVal(), self.parseUVal()),
-			0x32:lambda:LoadInstruction(ValType.I64, True, 16, self.parseUVal(), self.parseUVal()), 0x33:lambda:LoadInstruction(ValType.I64, False, 16, self.parseUVal(), self.parseUVal()),
-			0x34:lambda:LoadInstruction(ValType.I64, True, 32, self.parseUVal(), self.parseUVal()), 0x35:lambda:LoadInstruction(ValType.I64, False, 32, self.parseUVal(), self.parseUVal()),
-
-			0x36:lambda:StoreInstruction(ValType.I32, 32, self.parseUVal(), self.parseUVal()), 0x37:lambda:StoreInstruction(ValType.I64, 64, self.parseUVal(), self.parseUVal()),
-			0x38:lambda:StoreInstruction(ValType.F32, 32, self.parseUVal(), self.parseUVal()), 0x39:lambda:StoreInstruction(ValType.F64, 64, self.parseUVal(), self.parseUVal()),
-			
-			0x3A:lambda:StoreInstruction(ValType.I32, 8, self.parseUVal(), self.parseUVal()), 0x3B:lambda:StoreInstruction(ValType.I32, 16, self.parseUVal(), self.parseUVal()),
-			0x3C:lambda:StoreInstruction(ValType.I64, 8, self.parseUVal(), self.parseUVal()), 0x3D:lambda:StoreInstruction(ValType.I64, 16, self.parseUVal(), self.parseUVal()), 0x3E:lambda:StoreInstruction(ValType.I64, 32, self.parseUVal(), self.parseUVal()),
-
-			0x3F:lambda:MemSizeInstruction(self.parseUVal()), 0x40:lambda:MemGrowInstruction(self.parseUVal()),
-
-			0x41:lambda:ConstInstruction(ValType.I32, self.parseSVal()), 0x42:lambda:ConstInstruction(ValType.I64, self.parseSVal()),
-			0x43:lambda:ConstInstruction(ValType.F32, self.parseSVal()), 0x44:lambda:ConstInstruction(ValType.F64, self.parseSVal()),
-
-			0x45:lambda:OpInstruction(WasmInstr.EQZ, ValType.I32), 0x46:lambda:OpInstruction(WasmInstr.EQ, ValType.I32), 0x47:lambda:OpInstruction(WasmInstr.NE, ValType.I32),
-			0x48:lambda:OpInstruction(WasmInstr.LT, ValType.I32, True), 0x49:lambda:OpInstruction(WasmInstr.LT, ValType.I32, False),
-			0x4A:lambda:OpInstruction(WasmInstr.GT, ValType.I32, True), 0x4B:lambda:OpInstruction(WasmInstr.GT, ValType.I32, False),
-			0x4C:lambda:OpInstruction(WasmInstr.LE, ValType.I32, True), 0x4D:lambda:OpInstruction(WasmInstr.LE, ValType.I32, False),
-			0x4E:lambda:OpInstruction(WasmInstr.GE, ValType.I32, True), 0x4F:lambda:OpInstruction(WasmInstr.GE, ValType.I32, False),
-
-			0x50:lambda:OpInstruction(WasmInstr.EQZ, ValType.I64), 0x51:lambda:OpInstruction(WasmInstr.EQ, ValType.I64), 0x52:lambda:OpInstruction(WasmInstr.NE, ValType.I64),
-			0x53:lambda:OpInstruction(WasmInstr.LT, ValType.I64, True), 0x54:lambda:OpInstruction(WasmInstr.LT, ValType.I64, False),
-			0x55:lambda:OpInstruction(WasmInstr.GT, ValType.I64, True), 0x56:lambda:OpInstruction(WasmInstr.GT, ValType.I64, False),
-			0x57:lambda:OpInstruction(WasmInstr.LE, ValType.I64, True), 0x58:lambda:OpInstruction(WasmInstr.LE, ValType.I64, False),
-			0x59:lambda:OpInstruction(WasmInstr.GE, ValType.I64, True), 0x5A:lambda:OpInstruction(WasmInstr.GE, ValType.I64, False),
-
-			0x5B:lambda:OpInstruction(WasmInstr.EQ, ValType.F32), 0x5C:lambda:OpInstruction(WasmInstr.NE, ValType.F32), 0x5D:lambda:OpInstruction(WasmInstr.LT, ValType.F32),
-			0x5E:lambda:OpInstruction(WasmInstr.GT, ValType.F32), 0x5F:lambda:OpInstruction(WasmInstr.LE, ValType.F32), 0x60:lambda:OpInstruction(WasmInstr.GE, ValType.F32),
-
-			0x61:lambda:OpInstruction(WasmInstr.EQ, ValType.F64), 0x62:lambda:OpInstruction(WasmInstr.NE, ValType.F64), 0x63:lambda:OpInstruction(WasmInstr.LT, ValType.F64),
-			0x64:lambda:OpInstruction(WasmInstr.GT, ValType.F64), 0x65:lambda:OpInstruction(WasmInstr.LE, ValType.F64), 0x66:lambda:OpInstruction(WasmInstr.GE, ValType.F64),
-
-			0x67:lambda:OpInstruction(WasmInstr.CLZ, ValType.I32), 0x68:lambda:OpInstruction(WasmInstr.CTZ, ValType.I32), 
-			0x69:lambda:OpInstruction(WasmInstr.POPCNT, ValType.I32),
-			0x6A:lambda:OpInstruction(WasmInstr.ADD, ValType.I32), 0x6B:lambda:OpInstruction(WasmInstr.SUB, ValType.I32), 
-			0x6C:lambda:OpInstruction(WasmInstr.MUL, ValType.I32),
-			0x6D:lambda:OpInstruction(WasmInstr.DIV, ValType.I32, True), 0x6E:lambda:OpInstruction(WasmInstr.DIV, ValType.I32, False),
-			0x6F:lambda:OpInstruction(WasmInstr.REM, ValType.I32, True), 0x70:lambda:OpInstruction(WasmInstr.REM, ValType.I32, False),
-			0x71:lambda:OpInstruction(WasmInstr.AND, ValType.I32), 0x72:lambda:OpInstruction(WasmInstr.OR, ValType.I32),  0x73:lambda:OpInstruction(WasmInstr.XOR, ValType.I32), 
-			0x74:lambda:OpInstruction(WasmInstr.SHL, ValType.I32), 0x75:lambda:OpInstruction(WasmInstr.SHR, ValType.I32, False),  0x76:lambda:OpInstruction(WasmInstr.SHR, ValType.I32, False),
-			0x77:lambda:OpInstruction(WasmInstr.ROTL, ValType.I32), 0x78:lambda:OpInstruction(WasmInstr.ROR, ValType.I32),
-
-			0x79:lambda:OpInstruction(WasmInstr.CLZ, ValType.I64), 0x7A:lambda:OpInstruction(WasmInstr.CTZ, ValType.I64), 
-			0x7B:lambda:OpInstruction(WasmInstr.POPCNT, ValType.I64),
-			0x7C:lambda:OpInstruction(WasmInstr.ADD, ValType.I64), 0x7D:lambda:OpInstruction(WasmInstr.SUB, ValType.I64), 
-			0x7E:lambda:OpInstruction(WasmInstr.MUL, ValType.I64),
-			0x7F:lambda:OpInstruction(WasmInstr.DIV, ValType.I64, True), 0x80:lambda:OpInstruction(WasmInstr.DIV, ValType.I64, False),
-			0x81:lambda:OpInstruction(WasmInstr.REM, ValType.I64, True), 0x82:lambda:OpInstruction(WasmInstr.REM, ValType.I64, False),
-			0x83:lambda:OpInstruction(WasmInstr.AND, ValType.I64), 0x84:lambda:OpInstruction(WasmInstr.OR, ValType.I64), 0x85:lambda:OpInstruction(WasmInstr.XOR, ValType.I64), 
-			0x86:lambda:OpInstruction(WasmInstr.SHL, ValType.I64), 0x87:lambda:OpInstruction(WasmInstr.SHR, ValType.I64, False), 0x88:lambda:OpInstruction(WasmInstr.SHR, ValType.I64, False),
-			0x89:lambda:OpInstruction(WasmInstr.ROTL, ValType.I64), 0x8A:lambda:OpInstruction(WasmInstr.ROR, ValType.I64),
-			
-			0x8B:lambda:OpInstruction(WasmInstr.ABS, ValType.F32), 0x8C:lambda:OpInstruction(WasmInstr.NEG, ValType.F32), 
-			0x8D:lambda:OpInstruction(WasmInstr.CEIL, ValType.F32), 0x8E:lambda:OpInstruction(WasmInstr.FLOOR, ValType.F32), 
-			0x8F:lambda:OpInstruction(WasmInstr.TRUNC, ValType.F32),  0x90:lambda:OpInstruction(WasmInstr.NEAREST, ValType.F32),
-			0x91:lambda:OpInstruction(WasmInstr.SQRT, ValType.F32), 
-			0x92:lambda:OpInstruction(WasmInstr.ADD, ValType.F32), 0x93:lambda:OpInstruction(WasmInstr.SUB, ValType.F32),
-			0x94:lambda:OpInstruction(WasmInstr.MUL, ValType.F32), 0x95:lambda:OpInstruction(WasmInstr.DIV, ValType.F32),
-			0x96:lambda:OpInstruction(WasmInstr.MIN, ValType.F32), 0x97:lambda:OpInstruction(WasmInstr.MAX, ValType.F32), 
-			0x98:lambda:OpInstruction(WasmInstr.COPYSIGN, ValType.F32),
-
-			0x99:lambda:OpInstruction(WasmInstr.ABS, ValType.F64),
-			0x9A:lambda:OpInstruction(WasmInstr.NEG, ValType.F64),
-			0x9B:lambda:OpInstruction(WasmInstr.CEIL, ValType.F64),
-			0x9C:lambda:OpInstruction(WasmInstr.FLOOR, ValType.F64),
-			0x9D:lambda:OpInstruction(WasmInstr.TRUNC, ValType.F64),
-			0x9E:lambda:OpInstruction(WasmInstr.NEAREST, ValType.F64),
-			0x9F:lambda:OpInstruction(WasmInstr.SQRT, ValType.F64),
-			0xA0:lambda:OpInstruction(WasmInstr.ADD, ValType.F64),
-			0xA1:lambda:OpInstruction(WasmInstr.SUB, ValType.F64),
-			0xA2:lambda:OpInstruction(WasmInstr.MUL, ValType.F64),
-			0xA3:lambda:OpInstruction(WasmInstr.DIV, ValType.F64),
-			0xA4:lambda:OpInstruction(WasmInstr.MIN, ValType.F64),
-			0xA5:lambda:OpInstruction(WasmInstr.MAX, ValType.F64),
-			0xA6:lambda:OpInstruction(WasmInstr.COPYSIGN, ValType.F64),
-			
-			0xA7:lambda:CastInstruction(ValType.I64, ValType.I32),
-			0xA8:lambda:CastInstruction(ValType.F32, ValType.I32, True),
-			0xA9:lambda:CastInstruction(ValType.F32, ValType.I32, False),
-			0xAA:lambda:CastInstruction(ValType.F64, ValType.I32, True),
-			0xAB:lambda:CastInstruction(ValType.F64, ValType.I32, False),
-			0xAC:lambda:CastInstruction(ValType.I32, ValType.I64, True),
-			0xAD:lambda:CastInstruction(ValType.I32, ValType.I64, False),
-			0xAE:lambda:CastInstruction(ValType.F32, ValType.I64, True),
-			0xAF:lambda:CastInstruction(ValType.F32, ValType.I64, False),
-			0xB0:lambda:CastInstruction(ValType.F64, ValType.I64, True),
-			0xB1:lambda:CastInstruction(ValType.F64, ValType.I64, False),
-			0xB2:lambda:CastInstruction(ValType.I32, ValType.F32, True),
-			0xB3:lambda:CastInstruction(ValType.I32, ValType.F32, False),
-			0xB4:lambda:CastInstruction(ValType.I64, ValType.F32, True),
-			0xB5:lambda:CastInstruction(ValType.I64, ValType.F32, False),
-			0xB6:lambda:CastInstruction(ValType.F64, ValType.F32),
-			0xB7:lambda:CastInstruction(ValType.I32, ValType.F64, True),
-			0xB8:lambda:CastInstruction(ValType.I32, ValType.F64, False),
-			0xB9:lambda:CastInstruction(ValType.I64, ValType.F64, True),
-			0xBA:lambda:CastInstruction(ValType.I64, ValType.F64, False),
-			0xBB:lambda:CastInstruction(ValType.F32, ValType.F64),
-			0xBC:lambda:ReinterpretInstruction(ValType.F32, ValType.I32),
-			0xBD:lambda:ReinterpretInstruction(ValType.F64, ValType.I64),
-			0xBE:lambda:ReinterpretInstruction(ValType.I32, ValType.F32),
-			0xBF:lambda:ReinterpretInstruction(ValType.I64, ValType.F64),
-		}	
+		self.lazy = lazy
 
 	def parseCallInd(self):
 		type = self.parseTypeId()
-		assert self.parseByte() == b"\x00"
+		assert self.parser.read_u8() == 0x00
 		return CallInstruction(type = type)
 	def parseMagic(self):
-		if self.parser.pop(4) != b"\x00asm":
+		if self.parser.read_bytes(4) != b"\x00asm":
 			raise ParseException()
 	def parseVersion(self):
-		version = self.parser.pop(4)
-		print("Wasm-Version: %d.%d.%d.%d" % (version[0], version[1], version[2], version[3]))
+		version = self.parser.read_bytes(4)
+		logger.info("Wasm-Version: %d.%d.%d.%d", version[0], version[1], version[2], version[3])
 	def parseModule(self):
-		if self.parser.pop(4) != "\x00asm":
+		if self.parser.read_bytes(4) != b"\x00asm":
 			self.parser.revert(4)
 			raise ParseException()
 
@@ -201,25 +95,16 @@ class WasmParser:
 		return instrs
 
 	def parseBlockType(self):
-		val = self.parser.pop()
-		if val == b'\x40':
+		val = self.parser.read_u8()
+		if val == 0x40:
 			return None
 		else:
-			return ValType(ord(val))
+			return ValType(val)
 
 	def parseExpr(self):
 		instrs = self.parseInstrs()
-		assert self.parser.pop() == b'\x0b'
-		return instrs 
-	def parseIf(self):
-		blockType = self.parseBlockType()
-		instrs = self.parseInstrs()
-		obj = {'type': WasmInstr.IFELSE, 'blockType': blockType, 'instrs': instrs}
-		if self.parser.peek() == b'\x05':
-			self.parser.pop()
-			obj['altinstrs'] = self.parseInstrs()
-		assert self.parser.pop() == b'\x0b'
-		return obj
+		assert self.parser.read_u8() == 0x0b
+		return instrs
 	def parseBlock(self):
 		return BlockInstruction(self.parseBlockType(), self.parseExpr())
 	def parseLoop(self):
@@ -227,61 +112,73 @@ class WasmParser:
 	def parseIf(self):
 		blockType = self.parseBlockType()
 		exprs = self.parseInstrs()
-		if self.parser.peek() == b'\x05':
-			self.parser.pop()
+		if self.parser.peek_u8() == 0x05:
+			self.parser.skip(1)
 			return IfElseInstruction(blockType, exprs, self.parseExpr())
-		assert self.parser.pop() == b'\x0b'
+		assert self.parser.read_u8() == 0x0b
 		return IfElseInstruction(blockType, exprs)
 
 
 	def parseSection(self):
-		if len(self.parser.peek()) == 0:
+		if self.parser.eof():
 			return False
-		dispatch = {\
-			SectionType.CUSTOM: lambda: self.parser.pop(self.parseUVal()),
-			SectionType.TYPE: self.parseTypeSec,
-			SectionType.IMPORT: self.parseImportSec,
-			SectionType.FUNCTION: self.parseFunctionSec,
-			SectionType.TABLE: self.parseTableSec,
-			SectionType.MEMORY: self.parseMemorySec,
-			SectionType.GLOBAL: self.parseGlobalSec,
-			SectionType.EXPORT: self.parseExportSec,
-			SectionType.START: self.parseStartSec,
-			SectionType.ELEMENT: self.parseElementSec,
-			SectionType.CODE: self.parseCodeSec,
-			SectionType.DATA: self.parseDataSec,
-		}
-		sectionType = SectionType(ord(self.parser.pop()))
-		print("Parsing Section", sectionType)
+		sectionType = SectionType(self.parser.read_u8())
 		size = self.parseUVal()
+		self.module.sections.append(Section(sectionType, self.parser.position, size))
+		self.parseSectionBody(sectionType, size)
+		return True
+	def parseSectionBody(self, sectionType, size):
+		logger.debug("Parsing Section %s", sectionType)
 		oldpos = self.parser.position
-		dispatch[sectionType]()
+		profiler = Profile.profiler
+		if profiler != None:
+			start = time.perf_counter()
+		sectionParsers[sectionType](self, size)
+		if profiler != None:
+			profiler.addSection(sectionType, size, time.perf_counter() - start)
 		assert oldpos + size == self.parser.position
-		return True
+	#reads only the section headers, the payloads are skipped
+	def scanSections(self):
+		sections = []
+		oldpos = self.parser.position
+		while not self.parser.eof():
+			sectionType = SectionType(self.parser.read_u8())
+			size = self.parseUVal()
+			sections.append(Section(sectionType, self.parser.position, size))
+			self.parser.skip(size)
+		if self.parser.position != self.parser.size:
+			raise ParseException()
+		self.parser.position = oldpos
+		return sections
 
-	def parseTypeSec(self):
+	def parseCustomSec(self, size):
+		endpos = self.parser.position + size
+		name = self.parseString()
+		position = self.parser.position
+		self.module.customs.append(CustomSection(name, self.parser.read_bytes(endpos - position), position))
+	def parseTypeSec(self, size):
 		self.module.func_types = self.parseVector(self.parseFuncType)
-	def parseImportSec(self):
+	def parseImportSec(self, size):
 		self.module.imports = self.parseVector(self.parseImport)
-	def parseFunctionSec(self):
+	def parseFunctionSec(self, size):
 		self.module.custom_func_offset = len(self.module.functions)
 		self.module.functions.extend(self.parseVectorIndexed(self.parseFuncTypeId))
-	def parseTableSec(self):
+	def parseTableSec(self, size):
 		self.module.tables.extend(self.parseVector(self.parseTable))
-	def parseMemorySec(self):
+	def parseMemorySec(self, size):
 		self.module.memories.extend(self.parseVector(self.parseMem))
-	def parseGlobalSec(self):
+	def parseGlobalSec(self, size):
 		self.module.custom_global_offset = len(self.module.functions)
 		self.module.globals.extend(self.parseVectorIndexed(self.parseGlobal))
-	def parseExportSec(self):
+	def parseExportSec(self, size):
 		self.module.exports.extend(self.parseVector(self.parseExport))
-	def parseStartSec(self):
+	def parseStartSec(self, size):
 		self.module.start_func = self.parseUVal()
-	def parseElementSec(self):
+	def parseElementSec(self, size):
 		self.parseVectorIndexed(self.parseElement)
-	def parseCodeSec(self):
+	def parseCodeSec(self, size):
 		self.parseVectorIndexed(self.parseCode)
-	def parseDataSec(self):
+	def parseDataSec(self, size):
 		self.parseVector(self.parseData)
 
 	def parseGlobalId(self):
@@ -308,19 +205,51 @@ class WasmParser:
 		
 	def parseData(self):
 		mem = self.parseMemId()
-		init_range = InitRange(InitializableValue(self.parseExpr()), self.parseVector(self.parseByte))
+		offsetExpr = InitializableValue(self.parseExpr())
+		length = self.parseUVal()
+		position = self.parser.position
+		init_range = DataInitRange(offsetExpr, self.parser.read_bytes(length), position)
 		mem.initialize(init_range)
 	def parseCode(self, index):
 		size = self.parseUVal()
 		oldpos = self.parser.position
 		func = self.module.functions[self.module.custom_func_offset + index]
+		self.module.code_index[func.id] = (oldpos, oldpos + size)
+		if self.lazy:
+			func.loader = self
+			self.parser.skip(size)
+			return func
+		self.parseFunctionBody(func)
+		assert oldpos + size == self.parser.position
+		return func
+	def parseFunctionBody(self, func):
+		profiler = Profile.profiler
+		if profiler != None:
+			start = time.perf_counter()
+			blocks = sys.getallocatedblocks()
 		locals = []
 		for locs in self.parseVector(self.parseLocals):
 			locals.extend(locs)
 		func.locals = locals
 		func.expr = self.parseExpr()
-		assert oldpos + size == self.parser.position
-		return func
+		if profiler != None:
+			entry = profiler.function(func)
+			entry.parse += time.perf_counter() - start
+			entry.allocations += sys.getallocatedblocks() - blocks
+			entry.instructions = Profile.countInstructions(func._expr)
+	#the body as flat columns, decoded from the input without building instruction objects
+	def parseFlatBody(self, func):
+		start, end = self.module.code_index[func.id]
+		return decodeFlatBody(self.parser.data, start, end)
+	#decodes through a cursor of its own, so bodies of one module can be loaded from several threads at once
+	def loadFunctionBody(self, func):
+		start, end = self.module.code_index[func.id]
+		bodyParser = WasmParser(BufferParser(self.parser.data))
+		bodyParser.module = self.module
+		bodyParser.parser.position = start
+		bodyParser.parseFunctionBody(func)
+		assert end == bodyParser.parser.position
+		func.loader = None
 
 	def parseMem(self):
 		return Memory(self.parseLimits())
@@ -328,39 +257,42 @@ class WasmParser:
 		return self.parseUVal() * [self.parseValType()]
 	def parseElement(self, index):
 		table = self.parseTableId()
-		init_range = InitRange(InitializableValue(self.parseExpr()), self.parseVector(self.parseFuncId))
+		offsetExpr = InitializableValue(self.parseExpr())
+		functions = self.module.functions
+		init_range = InitRange(offsetExpr, [functions[func_id] for func_id in self.parseUValVector()])
 		table.initialize(init_range)
 		
 		
 	def parseExport(self):
 		sym = self.parseString()
-		exportType = ExportDescrType(ord(self.parser.pop()))
+		exportType = ExportDescrType(self.parser.read_u8())
 		if exportType == ExportDescrType.FUNC:
-			self.parseFuncId().export = True
+			target = self.parseFuncId()
 		elif exportType == ExportDescrType.TABLE:
-			self.parseTableId().export = True
+			target = self.parseTableId()
 		elif exportType == ExportDescrType.MEM:
-			self.parseMemId().export = True
+			target = self.parseMemId()
 		elif exportType == ExportDescrType.GLOBAL:
-			self.parseGlobalId().export = True
+			target = self.parseGlobalId()
 		else:
 			raise ParseException()
+		target.export = True
+		return Export(sym, exportType, target)
 		
 	def parseInstr(self):
-		val = ord(self.parser.pop())
-		if val in self.instructionHaldlers:
-			instr = self.instructionHaldlers[val]()
+		val = self.parser.read_u8()
+		instr = sharedInstructions[val]
+		if instr != None:
 			return instr
+		decoder = instructionDecoders[val]
+		if decoder != None:
+			return decoder(self)
 		self.parser.revert()
 		return None
-	def parseExpr(self):
-		expr = self.parseInstrs()
-		assert self.parser.pop() == b'\x0b'
-		return expr
 	def parseGlobal(self, index):
-		return Global(self.parseValType(), "global" + str(self.module.custom_clobal_offset + index), mutable = ord(self.parser.pop()) == 0x01, init_value = InitializableValue(self.parseExpr()))
+		return Global(self.parseValType(), "global" + str(self.module.custom_clobal_offset + index), mutable = self.parser.read_u8() == 0x01, init_value = InitializableValue(self.parseExpr()))
 	def parseByte(self):
-		return self.parser.pop()
+		return self.parser.read_u8()
 	def parseFuncTypeId(self, index):
 		type = self.parseTypeId()
 		return Function(self.module.custom_func_offset + index, type, "func" + str(self.module.custom_func_offset + index))
@@ -368,7 +300,7 @@ class WasmParser:
 		module = self.parseString()
 		sym = self.parseString()
 		import_module = self.module.get_import_module(module)
-		importType = ImportDescrType(ord(self.parser.pop()))
+		importType = ImportDescrType(self.parser.read_u8())
 		if importType == ImportDescrType.FUNC:
 			func = Function(len(self.module.functions), self.parseTypeId(), sym, _import = True)
 			import_module[sym] = func
@@ -383,55 +315,54 @@ class WasmParser:
 			import_module[sym] = memory
 			self.module.memories.append(memory)
 		elif importType == ImportDescrType.GLOBAL:
-			_global = Global(self.parseValType(), mutable = ord(self.parser.pop()) == 0x01, name = sym, _import = True)
+			_global = Global(self.parseValType(), mutable = self.parser.read_u8() == 0x01, name = sym, _import = True)
 			import_module[sym] = _global
 			self.module.globals.append(_global)
 		else:
 			raise ParseException()
 	def parseString(self):
-		return self.parser.pop(self.parseUVal()).decode("utf-8") 
+		return str(self.parser.read_bytes(self.parseUVal()), "utf-8")
+	#a value running past the end of the input is a truncated module
 	def parseUVal(self):
-		result = 0
-		shift = 0
-		while True:
-			byte = ord(self.parser.pop())
-			result |= (byte & 0x7f) << shift
-			if (byte & 0x80) == 0x00:
-				break
-			shift += 7
-		return result
+		try:
+			value, self.parser.position = readULEB128(self.parser.data, self.parser.position)
+		except IndexError:
+			raise ParseException() from None
+		return value
 	def parseSVal(self):
-		result = 0
-		shift = 0
-		lastVal = 0
-		while True:
-			byte = ord(self.parser.pop())
-			lastVal = (byte & 0x7f)
-			result |= lastVal << shift
-			if (byte & 0x80) == 0x00:
-				break
-			shift += 7
-		if lastVal & 0x40  != 0x00:
-			result ^= 1 << (shift + 6)
-			result *= -1
-		return result
+		try:
+			value, self.parser.position = readSLEB128(self.parser.data, self.parser.position)
+		except IndexError:
+			raise ParseException() from None
+		return value
+	def parseUValVector(self):
+		try:
+			values, self.parser.position = readULEB128Vector(self.parser.data, self.parser.position)
+		except IndexError:
+			raise ParseException() from None
+		return values
+	def parseF32(self):
+		return struct.unpack("<f", self.parser.read_bytes(4))[0]
+	def parseF64(self):
+		return struct.unpack("<d", self.parser.read_bytes(8))[0]
 
 	def parseValType(self):
-		type = ValType(ord(self.parser.pop()))
+		type = ValType(self.parser.read_u8())
 		return type
 	def parseTable(self):
-		return Table(self.parseTableType())
+		self.parseTableType()
+		return Table(self.parseLimits())
 	def parseTableType(self):
-		return TableType(ord(self.parser.pop()))
+		return TableType(self.parser.read_u8())
 	def parseLimits(self):
-		val = ord(self.parser.pop())
+		val = self.parser.read_u8()
 		if val == 0x00:
 			return Limit(self.parseUVal())
 		elif val == 0x01:
 			return Limit(self.parseUVal(), self.parseUVal())
 		raise ParseException()
 	def parseFuncType(self):
-		if self.parser.pop() == b'\x60':
+		if self.parser.read_u8() == 0x60:
 			return FunctionType(self.parseVector(self.parseValType), self.parseVector(self.parseValType))
 		raise ParseException()
 	def parseVector(self, elementParser):
@@ -447,10 +378,149 @@ class WasmParser:
 			arr.append(elementParser(i))
 		return arr
 
-	def parseWasm(self):
+	def parseWasm(self, sections = None):
+		profiler = Profile.profiler
+		if profiler != None:
+			start = time.perf_counter()
 		self.module = Module()
 		self.parseMagic()
 		self.parseVersion()
-		while self.parseSection():
-			pass
+		if sections == None:
+			while self.parseSection():
+				pass
+		else:
+			wanted = set(sections)
+			for sectionType in sections:
+				wanted |= sectionDependencies.get(sectionType, set())
+			self.module.sections = self.scanSections()
+			for section in self.module.sections:
+				if section.type in wanted:
+					self.parser.position = section.offset
+					self.parseSectionBody(section.type, section.size)
+			self.parser.position = self.parser.size
+		if profiler != None:
+			profiler.parseTime += time.perf_counter() - start
 		return self.module
+
+
+sectionParsers = {
+	SectionType.CUSTOM: WasmParser.parseCustomSec,
+	SectionType.TYPE: WasmParser.parseTypeSec,
+	SectionType.IMPORT: WasmParser.parseImportSec,
+	SectionType.FUNCTION: WasmParser.parseFunctionSec,
+	SectionType.TABLE: WasmParser.parseTableSec,
+	SectionType.MEMORY: WasmParser.parseMemorySec,
+	SectionType.GLOBAL: WasmParser.parseGlobalSec,
+	SectionType.EXPORT: WasmParser.parseExportSec,
+	SectionType.START: WasmParser.parseStartSec,
+	SectionType.ELEMENT: WasmParser.parseElementSec,
+	SectionType.CODE: WasmParser.parseCodeSec,
+	SectionType.DATA: WasmParser.parseDataSec,
+}
+
+#sections whose entries refer to indices defined by other sections
+sectionDependencies = {
+	SectionType.IMPORT: {SectionType.TYPE},
+	#imported tables, memories and globals come first in their index spaces
+	SectionType.TABLE: {SectionType.TYPE, SectionType.IMPORT},
+	SectionType.MEMORY: {SectionType.TYPE, SectionType.IMPORT},
+	SectionType.GLOBAL: {SectionType.TYPE, SectionType.IMPORT},
+	SectionType.FUNCTION: {SectionType.TYPE, SectionType.IMPORT},
+	SectionType.EXPORT: {SectionType.TYPE, SectionType.IMPORT, SectionType.FUNCTION, SectionType.TABLE, SectionType.MEMORY, SectionType.GLOBAL},
+	SectionType.START: {SectionType.TYPE, SectionType.IMPORT, SectionType.FUNCTION},
+	SectionType.ELEMENT: {SectionType.TYPE, SectionType.IMPORT, SectionType.FUNCTION, SectionType.TABLE, SectionType.GLOBAL},
+	SectionType.CODE: {SectionType.TYPE, SectionType.IMPORT, SectionType.FUNCTION, SectionType.GLOBAL},
+	SectionType.DATA: {SectionType.TYPE, SectionType.IMPORT, SectionType.MEMORY, SectionType.GLOBAL},
+}
+#instructions without immediates carry only constant data and are shared between all parsers
+sharedInstructions = [None] * 256
+#instructions with immediates are decoded by a function taking the WasmParser
+instructionDecoders = [None] * 256
+
+sharedInstructions[0x00] = UnreachableInstruction()
+sharedInstructions[0x01] = NopInstruction()
+sharedInstructions[0x0F] = ReturnInstruction()
+sharedInstructions[0x1A] = DropInstruction()
+sharedInstructions[0x1B] = SelectInstruction()
+
+instructionDecoders[0x02] = WasmParser.parseBlock
+instructionDecoders[0x03] = WasmParser.parseLoop
+instructionDecoders[0x04] = WasmParser.parseIf
+instructionDecoders[0x0C] = lambda parser: BranchInstruction(parser.parseUVal())
+instructionDecoders[0x0D] = lambda parser: BranchInstruction(parser.parseUVal(), True)
+instructionDecoders[0x0E] = lambda parser: BranchTableInstruction(parser.parseUValVector(), parser.parseUVal())
+instructionDecoders[0x10] = lambda parser: CallInstruction(target = parser.parseFuncId())
+instructionDecoders[0x11] = WasmParser.parseCallInd
+instructionDecoders[0x20] = lambda parser: GetLocalInstruction(parser.parseUVal())
+instructionDecoders[0x21] = lambda parser: SetLocalInstruction(parser.parseUVal())
+instructionDecoders[0x22] = lambda parser: TeeLocalInstruction(parser.parseUVal())
+instructionDecoders[0x23] = lambda parser: GetGlobalInstruction(parser.parseUVal())
+instructionDecoders[0x24] = lambda parser: SetGlobalInstruction(parser.parseUVal())
+instructionDecoders[0x3F] = lambda parser: MemSizeInstruction(parser.parseUVal())
+instructionDecoders[0x40] = lambda parser: MemGrowInstruction(parser.parseUVal())
+instructionDecoders[0x41] = lambda parser: ConstInstruction(ValType.I32, parser.parseSVal())
+instructionDecoders[0x42] = lambda parser: ConstInstruction(ValType.I64, parser.parseSVal())
+instructionDecoders[0x43] = lambda parser: ConstInstruction(ValType.F32, parser.parseF32())
+instructionDecoders[0x44] = lambda parser: ConstInstruction(ValType.F64, parser.parseF64())
+
+def makeLoadDecoder(valtype, s_ext, length):
+	return lambda parser: LoadInstruction(valtype, s_ext, length, parser.parseUVal(), parser.parseUVal())
+def makeStoreDecoder(valtype, length):
+	return lambda parser: StoreInstruction(valtype, length, parser.parseUVal(), parser.parseUVal())
+
+for opcode, valtype, s_ext, length in (
+		(0x28, ValType.I32, False, 32), (0x29, ValType.I64, False, 64), (0x2A, ValType.F32, False, 32), (0x2B, ValType.F64, False, 64),
+		(0x2C, ValType.I32, True, 8), (0x2D, ValType.I32, False, 8), (0x2E, ValType.I32, True, 16), (0x2F, ValType.I32, False, 16),
+		(0x30, ValType.I64, True, 8), (0x31, ValType.I64, False, 8), (0x32, ValType.I64, True, 16), (0x33, ValType.I64, False, 16),
+		(0x34, ValType.I64, True, 32), (0x35, ValType.I64, False, 32)):
+	instructionDecoders[opcode] = makeLoadDecoder(valtype, s_ext, length)
+for opcode, valtype, length in (
+		(0x36, ValType.I32, 32), (0x37, ValType.I64, 64), (0x38, ValType.F32, 32), (0x39, ValType.F64, 64),
+		(0x3A, ValType.I32, 8), (0x3B, ValType.I32, 16), (0x3C, ValType.I64, 8), (0x3D, ValType.I64, 16), (0x3E, ValType.I64, 32)):
+	instructionDecoders[opcode] = makeStoreDecoder(valtype, length)
+
+for valtype, opcode, ops in (
+		(ValType.I32, 0x45, ((WasmInstr.EQZ,), (WasmInstr.EQ,), (WasmInstr.NE,),
+			(WasmInstr.LT, True), (WasmInstr.LT, False), (WasmInstr.GT, True), (WasmInstr.GT, False),
+			(WasmInstr.LE, True), (WasmInstr.LE, False), (WasmInstr.GE, True), (WasmInstr.GE, False))),
+		(ValType.I64, 0x50, ((WasmInstr.EQZ,), (WasmInstr.EQ,), (WasmInstr.NE,),
+			(WasmInstr.LT, True), (WasmInstr.LT, False), (WasmInstr.GT, True), (WasmInstr.GT, False),
+			(WasmInstr.LE, True), (WasmInstr.LE, False), (WasmInstr.GE, True), (WasmInstr.GE, False))),
+		(ValType.F32, 0x5B, ((WasmInstr.EQ,), (WasmInstr.NE,), (WasmInstr.LT,), (WasmInstr.GT,), (WasmInstr.LE,), (WasmInstr.GE,))),
+		(ValType.F64, 0x61, ((WasmInstr.EQ,), (WasmInstr.NE,), (WasmInstr.LT,), (WasmInstr.GT,), (WasmInstr.LE,), (WasmInstr.GE,))),
+		(ValType.I32, 0x67, ((WasmInstr.CLZ,), (WasmInstr.CTZ,), (WasmInstr.POPCNT,),
+			(WasmInstr.ADD,), (WasmInstr.SUB,), (WasmInstr.MUL,), (WasmInstr.DIV, True), (WasmInstr.DIV, False),
+			(WasmInstr.REM, True), (WasmInstr.REM, False), (WasmInstr.AND,), (WasmInstr.OR,), (WasmInstr.XOR,),
+			(WasmInstr.SHL,), (WasmInstr.SHR, True), (WasmInstr.SHR, False), (WasmInstr.ROTL,), (WasmInstr.ROTR,))),
+		(ValType.I64, 0x79, ((WasmInstr.CLZ,), (WasmInstr.CTZ,), (WasmInstr.POPCNT,),
+			(WasmInstr.ADD,), (WasmInstr.SUB,), (WasmInstr.MUL,), (WasmInstr.DIV, True), (WasmInstr.DIV, False),
+			(WasmInstr.REM, True), (WasmInstr.REM, False), (WasmInstr.AND,), (WasmInstr.OR,), (WasmInstr.XOR,),
+			(WasmInstr.SHL,), (WasmInstr.SHR, True), (WasmInstr.SHR, False), (WasmInstr.ROTL,), (WasmInstr.ROTR,))),
+		(ValType.F32, 0x8B, ((WasmInstr.ABS,), (WasmInstr.NEG,), (WasmInstr.CEIL,), (WasmInstr.FLOOR,), (WasmInstr.TRUNC,),
+			(WasmInstr.NEAREST,), (WasmInstr.SQRT,), (WasmInstr.ADD,), (WasmInstr.SUB,), (WasmInstr.MUL,), (WasmInstr.DIV,),
+			(WasmInstr.MIN,), (WasmInstr.MAX,), (WasmInstr.COPYSIGN,))),
+		(ValType.F64, 0x99, ((WasmInstr.ABS,), (WasmInstr.NEG,), (WasmInstr.CEIL,), (WasmInstr.FLOOR,), (WasmInstr.TRUNC,),
+			(WasmInstr.NEAREST,), (WasmInstr.SQRT,), (WasmInstr.ADD,), (WasmInstr.SUB,), (WasmInstr.MUL,), (WasmInstr.DIV,),
+			(WasmInstr.MIN,), (WasmInstr.MAX,), (WasmInstr.COPYSIGN,)))):
+	for op in ops:
+		sharedInstructions[opcode] = OpInstruction(op[0], valtype, *op[1:])
+		opcode += 1
+
+for opcode, fromtype, totype, signed in (
+		(0xA7, ValType.I64, ValType.I32, False),
+		(0xA8, ValType.F32, ValType.I32, True), (0xA9, ValType.F32, ValType.I32, False),
+		(0xAA, ValType.F64, ValType.I32, True), (0xAB, ValType.F64, ValType.I32, False),
+		(0xAC, ValType.I32, ValType.I64, True), (0xAD, ValType.I32, ValType.I64, False),
+		(0xAE, ValType.F32, ValType.I64, True), (0xAF, ValType.F32, ValType.I64, False),
+		(0xB0, ValType.F64, ValType.I64, True), (0xB1, ValType.F64, ValType.I64, False),
+		(0xB2, ValType.I32, ValType.F32, True), (0xB3, ValType.I32, ValType.F32, False),
+		(0xB4, ValType.I64, ValType.F32, True), (0xB5, ValType.I64, ValType.F32, False),
+		(0xB6, ValType.F64, ValType.F32, False),
+		(0xB7, ValType.I32, ValType.F64, True), (0xB8, ValType.I32, ValType.F64, False),
+		(0xB9, ValType.I64, ValType.F64, True), (0xBA, ValType.I64, ValType.F64, False),
+		(0xBB, ValType.F32, ValType.F64, False)):
+	sharedInstructions[opcode] = CastInstruction(fromtype, totype, signed)
+sharedInstructions[0xBC] = ReinterpretInstruction(ValType.F32, ValType.I32)
+sharedInstructions[0xBD] = ReinterpretInstruction(ValType.F64, ValType.I64)
+sharedInstructions[0xBE] = ReinterpretInstruction(ValType.I32, ValType.F32)
+sharedInstructions[0xBF] = ReinterpretInstruction(ValType.I64, ValType.F64)
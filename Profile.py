@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+
+import sys
+import json
+import time
+
+#the active Profiler, hooks check this and do nothing while it is None
+profiler = None
+
+def enableProfiling():
+	global profiler
+	profiler = Profiler()
+	return profiler
+
+def disableProfiling():
+	global profiler
+	profiler = None
+
+#counts the instructions of a decoded tree, the same count as FlatBody.instructionCount without decoding again
+def countInstructions(exprs):
+	count = 0
+	stack = [exprs]
+	while len(stack) != 0:
+		exprs = stack.pop()
+		count += len(exprs)
+		for instr in exprs:
+			expr = getattr(instr, "expr", None)
+			if expr != None:
+				stack.append(expr)
+			altexpr = getattr(instr, "altexpr", None)
+			if altexpr != None:
+				stack.append(altexpr)
+	return count
+
+class FunctionProfile:
+	__slots__ = ("id", "name", "instructions", "parse", "decompile", "render", "allocations")
+	def __init__(self, func):
+		self.id = func.id
+		self.name = func.name
+		self.instructions = 0
+		self.parse = 0.0
+		self.decompile = 0.0
+		self.render = 0.0
+		self.allocations = 0
+	def total(self):
+		return self.parse + self.decompile + self.render
+	def toJson(self):
+		return {"id": self.id, "name": self.name, "instructions": self.instructions, "parse": self.parse,
+			"decompile": self.decompile, "render": self.render, "total": self.total(), "allocations": self.allocations}
+
+class Profiler:
+	def __init__(self):
+		self.sections = dict()
+		self.functions = dict()
+		self.parseTime = 0.0
+	def addSection(self, sectionType, size, seconds):
+		entry = self.sections.setdefault(str(sectionType), {"count": 0, "bytes": 0, "seconds": 0.0})
+		entry["count"] += 1
+		entry["bytes"] += size
+		entry["seconds"] += seconds
+	def function(self, func):
+		if func.id not in self.functions:
+			self.functions[func.id] = FunctionProfile(func)
+		return self.functions[func.id]
+	def summary(self, top = 20):
+		functions = list(self.functions.values())
+		functions.sort(key = lambda entry: entry.total(), reverse = True)
+		return {
+			"phases": {
+				"parse": self.parseTime,
+				"function_parse": sum(entry.parse for entry in functions),
+				"decompile": sum(entry.decompile for entry in functions),
+				"render": sum(entry.render for entry in functions),
+			},
+			"sections": self.sections,
+			"functions": len(functions),
+			"instructions": sum(entry.instructions for entry in functions),
+			"slowest": [entry.toJson() for entry in functions[:top]],
+		}
+	def dump(self, filename, top = 20):
+		summary = self.summary(top)
+		if filename == "-":
+			json.dump(summary, sys.stderr, indent = "\t")
+			sys.stderr.write("\n")
+		else:
+			with open(filename, "w") as file:
+				json.dump(summary, file, indent = "\t")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+#
+
+import sys
+import time
+
+#rewrites a single status line on stderr, at most once per interval
+class ProgressReporter:
+	def __init__(self, total, label = "functions", interval = 1.0, stream = sys.stderr):
+		self.total = total
+		self.label = label
+		self.interval = interval
+		self.stream = stream
+		self.done = 0
+		self.start = time.monotonic()
+		self.lastReport = self.start
+	def update(self, count = 1):
+		self.done += count
+		now = time.monotonic()
+		if now - self.lastReport >= self.interval:
+			self.lastReport = now
+			self.report(now)
+	def report(self, now):
+		elapsed = now - self.start
+		rate = self.done / elapsed if elapsed > 0 else 0.0
+		line = "%d/%d %s, %.1f %s/s" % (self.done, self.total, self.label, rate, self.label)
+		if rate > 0 and self.done < self.total:
+			line += ", ETA %ds" % ((self.total - self.done) / rate)
+		self.stream.write("\r" + line + "\033[K")
+		self.stream.flush()
+	def finish(self):
+		self.report(time.monotonic())
+		self.stream.write("\n")
+		self.stream.flush()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+#
+
+from Parser import *
+
+#returns the length of the LEB128 value at offset, 0 while its last byte has not arrived yet
+def lebLength(data, offset, end):
+	for position in range(offset, min(end, offset + 10)):
+		if data[position] < 0x80:
+			return position + 1 - offset
+	if end - offset >= 10:
+		raise ParseException()
+	return 0
+
+#parses a module from chunks as they arrive, only the unparsed rest of the stream is buffered.
+#every section and every function body is parsed once all of its bytes are there, so the
+#bodies of early functions are ready long before the code section is complete.
+#the bodies are decoded eagerly, a streamed module has no file to load them from later.
+class StreamingWasmParser:
+	def __init__(self):
+		self.buffer = bytearray()
+		self.start = 0
+		#stream position of buffer[0]
+		self.offset = 0
+		self.module = Module()
+		self.wasmparser = WasmParser(None)
+		self.wasmparser.module = self.module
+		self.started = False
+		self.code = None
+		self.remaining = None
+		self.index = 0
+
+	#returns the sections and functions completed by this chunk in stream order
+	def feed(self, data):
+		self.buffer += data
+		items = []
+		item = self.step()
+		while item != None:
+			items.append(item)
+			item = self.step()
+		del self.buffer[:self.start]
+		self.offset += self.start
+		self.start = 0
+		return items
+
+	def close(self):
+		if not self.started or self.code != None or self.start != len(self.buffer):
+			raise ParseException()
+		return self.module
+
+	#reads chunks from a file, pipe or socket file until its end and yields what feed returns, the module last
+	def parseFile(self, file, chunkSize = 1 << 16):
+		read = getattr(file, "read1", file.read)
+		chunk = read(chunkSize)
+		while chunk:
+			yield from self.feed(chunk)
+			chunk = read(chunkSize)
+		yield self.close()
+
+	def position(self):
+		return self.offset + self.start
+	def available(self):
+		return len(self.buffer) - self.start
+	def take(self, count):
+		data = bytes(self.buffer[self.start:self.start + count])
+		self.start += count
+		return data
+
+	def step(self):
+		if not self.started:
+			return self.parseHeader()
+		if self.code != None:
+			return self.parseCodeEntry()
+		return self.parseSection()
+
+	def parseHeader(self):
+		if self.available() < 8:
+			return None
+		self.wasmparser.parser = BufferParser(self.take(8))
+		self.wasmparser.parseMagic()
+		self.wasmparser.parseVersion()
+		self.started = True
+		return self.step()
+
+	def parseSection(self):
+		if self.available() < 2:
+			return None
+		length = lebLength(self.buffer, self.start + 1, len(self.buffer))
+		if length == 0:
+			return None
+		sectionType = SectionType(self.buffer[self.start])
+		size = readULEB128(self.buffer, self.start + 1)[0]
+		if sectionType == SectionType.CODE:
+			self.start += 1 + length
+			self.code = Section(sectionType, self.position(), size)
+			self.remaining = None
+			self.index = 0
+			return self.parseCodeEntry()
+		if self.available() < 1 + length + size:
+			return None
+		self.start += 1 + length
+		section = Section(sectionType, self.position(), size)
+		self.module.sections.append(section)
+		customs = len(self.module.customs)
+		ranges = [len(mem.init_list) for mem in self.module.memories]
+		self.wasmparser.parser = BufferParser(self.take(size))
+		self.wasmparser.parseSectionBody(sectionType, size)
+		#positions in the payload are made stream positions again
+		for custom in self.module.customs[customs:]:
+			custom.position += section.offset
+		for mem, count in zip(self.module.memories, ranges):
+			for init_range in mem.init_list[count:]:
+				init_range.position += section.offset
+		return section
+
+	def parseCodeEntry(self):
+		if self.remaining == None:
+			length = lebLength(self.buffer, self.start, len(self.buffer))
+			if length == 0:
+				return None
+			self.remaining = readULEB128(self.buffer, self.start)[0]
+			self.start += length
+		if self.remaining == 0:
+			section = self.code
+			if self.position() != section.offset + section.size:
+				raise ParseException()
+			self.module.sections.append(section)
+			self.code = None
+			return section
+		length = lebLength(self.buffer, self.start, len(self.buffer))
+		if length == 0:
+			return None
+		size = readULEB128(self.buffer, self.start)[0]
+		if self.available() < length + size:
+			return None
+		self.start += length
+		func = self.module.functions[self.module.custom_func_offset + self.index]
+		self.module.code_index[func.id] = (self.position(), self.position() + size)
+		self.wasmparser.parser = BufferParser(self.take(size))
+		self.wasmparser.parseFunctionBody(func)
+		assert self.wasmparser.parser.position == size
+		self.index += 1
+		self.remaining -= 1
+		return func
@@ -132,15 +132,32 @@ class InitRange:
 		self.offsetExpr = offsetExpr
 		self.values = values
 	def printExpr(self, module):
-		if type(self.values[0]) == bytes:
-			return "offset " + str(self.offsetExpr.getValue(module)) + " " + str(b''.join(self.values))[1:]
-		elif type(self.values[0]) == Function:
+		if type(self.values[0]) == Function:
 			return "offset " + str(self.offsetExpr.getValue(module)) + " (" + ", ".join(map(lambda f: f.name, self.values)) + ")"
 		else:
 			return "offset " + str(self.offsetExpr.getValue(module)) + " " + ", ".join(map(lambda x: str(x), self.values)) + ")"
 			
 	def __repr__(self):
 		return "Range(" + str(self.offsetExpr) + ": FuncType " + str(self.values)
+
+class DataInitRange(InitRange):
+	previewLength = 64
+	def __init__(self, offsetExpr, data, position = None):
+		super().__init__(offsetExpr, data)
+		self.length = len(data)
+		self.position = position
+	def printExpr(self, module):
+		string = "offset " + str(self.offsetExpr.getValue(module)) + " " + str(bytes(self.values[:self.previewLength]))[1:]
+		if self.length > self.previewLength:
+			string += "... (" + str(self.length) + " bytes)"
+		return string
+	def hexdump(self, module, width = 16):
+		offset = self.offsetExpr.getValue(module)
+		for i in range(0, self.length, width):
+			chunk = bytes(self.values[i:i + width])
+			yield (str(offset + i) if type(offset) == int else str(offset) + " + " + str(i)) + ": " + chunk.hex(" ")
+	def __repr__(self):
+		return "Range(" + str(self.offsetExpr) + ": " + str(self.length) + " bytes)"
 		
 class Table:
 	def __init__(self, limit, name = None, _import = False):
@@ -181,8 +198,25 @@ class Function:
 		self.type = type
 		self._import = _import
 		self.export = False
-		self.locals = []
-		self.expr = None
+		self.loader = None
+		self._locals = []
+		self._expr = None
+	@property
+	def locals(self):
+		if self.loader != None:
+			self.loader.loadFunctionBody(self)
+		return self._locals
+	@locals.setter
+	def locals(self, locals):
+		self._locals = locals
+	@property
+	def expr(self):
+		if self.loader != None:
+			self.loader.loadFunctionBody(self)
+		return self._expr
+	@expr.setter
+	def expr(self, expr):
+		self._expr = expr
 	def printExpr(self, module):
 		string = "Function " + str(self.name) + ": " + str(self.type)
 		if self._import:
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+
+from Parser import *
+from Decomp import *
+from Output import *
+
+def findModules(paths):
+	modules = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, files in os.walk(path):
+				dirs.sort()
+				for name in sorted(files):
+					if name.endswith(".wasm"):
+						filename = os.path.join(root, name)
+						modules.append((filename, os.path.relpath(filename, path)))
+		else:
+			modules.append((path, os.path.basename(path)))
+	return modules
+
+def outputPaths(modules, outdir):
+	used = set()
+	jobs = []
+	for filename, relative in modules:
+		output = os.path.join(outdir, relative + ".txt")
+		count = 1
+		while output in used:
+			output = os.path.join(outdir, relative + "-" + str(count) + ".txt")
+			count += 1
+		used.add(output)
+		jobs.append((filename, output))
+	return jobs
+
+def initWorker(memoryLimit):
+	if memoryLimit != None:
+		import resource
+		resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+
+def decompileFile(job):
+	filename, output = job
+	result = {"input": filename, "output": output}
+	start = time.perf_counter()
+	try:
+		result["bytes"] = os.path.getsize(filename)
+		with open(filename, "rb") as file:
+			module = WasmParser(mapFile(file), lazy = True).parseWasm()
+			result["parse"] = time.perf_counter() - start
+			result["functions"] = len([func for func in module.functions if not func._import])
+			os.makedirs(os.path.dirname(output) or ".", exist_ok = True)
+			#the output only appears once it is complete, a failed module leaves nothing behind
+			with openWriter(output + ".part") as writer:
+				decompileWasmModule(module, writer)
+			os.replace(output + ".part", output)
+			result["decompile"] = time.perf_counter() - start - result["parse"]
+	except Exception as e:
+		result["error"] = traceback.format_exception_only(type(e), e)[-1].strip()
+		del result["output"]
+		try:
+			os.remove(output + ".part")
+		except FileNotFoundError:
+			pass
+	result["seconds"] = time.perf_counter() - start
+	return result
+
+def decompileBatch(paths, outdir, jobs = None, memoryLimit = None, tasksPerWorker = 16):
+	work = outputPaths(findModules(paths), outdir)
+	start = time.perf_counter()
+	results = []
+	with multiprocessing.Pool(jobs, initWorker, (memoryLimit,), maxtasksperchild = tasksPerWorker) as pool:
+		for result in pool.imap_unordered(decompileFile, work):
+			if "error" in result:
+				print("failed: " + result["input"] + ": " + result["error"], file = sys.stderr)
+			results.append(result)
+	results.sort(key = lambda result: result["input"])
+	failed = [result for result in results if "error" in result]
+	return {
+		"modules": results,
+		"succeeded": len(results) - len(failed),
+		"failed": len(failed),
+		"seconds": time.perf_counter() - start,
+		"bytes": sum(result.get("bytes", 0) for result in results),
+	}
+
+if __name__ == '__main__':
+	argparser = argparse.ArgumentParser(description = "Decompiles many wasm-files in a pool of worker processes")
+	argparser.add_argument("inputs", nargs = "+", help = "wasm-files or directories searched for *.wasm")
+	argparser.add_argument("-o", "--outdir", required = True, help = "directory for the decompiled files, one per module")
+	argparser.add_argument("-j", "--jobs", type = int, default = None, metavar = "N", help = "number of worker processes, all cores by default")
+	argparser.add_argument("--memory-limit", type = int, default = None, metavar = "MB", help = "address space limit of each worker")
+	argparser.add_argument("--tasks-per-worker", type = int, default = 16, metavar = "N", help = "replace a worker after N modules to return its memory")
+	argparser.add_argument("--summary", metavar = "FILE", help = "write the JSON summary to FILE instead of stdout")
+	args = argparser.parse_args()
+
+	memoryLimit = None if args.memory_limit == None else args.memory_limit << 20
+	summary = decompileBatch(args.inputs, args.outdir, args.jobs, memoryLimit, args.tasks_per_worker)
+	if args.summary != None:
+		with open(args.summary, "w") as file:
+			json.dump(summary, file, indent = "\t")
+	else:
+		json.dump(summary, sys.stdout, indent = "\t")
+		print()
+	if summary["failed"] != 0:
+		exit(1)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+#
+
+import random
+import timeit
+
+from Leb128 import *
+
+def oldReadULEB128(data, offset):
+	result = 0
+	shift = 0
+	while True:
+		byte = data[offset:offset + 1][0]
+		offset += 1
+		result |= (byte & 0x7f) << shift
+		if (byte & 0x80) == 0x00:
+			break
+		shift += 7
+	return result, offset
+
+def decodeAll(decoder, data, count):
+	offset = 0
+	for i in range(count):
+		value, offset = decoder(data, offset)
+
+def bench(name, values, encoder, decoder, count = 100000):
+	data = memoryview(b"".join(map(encoder, values)))
+	seconds = min(timeit.repeat(lambda: decodeAll(decoder, data, len(values)), number = 1, repeat = 5))
+	print("%-28s %8.1f ns/value" % (name, seconds / len(values) * 1e9))
+
+if __name__ == '__main__':
+	random.seed(0)
+	count = 100000
+	small = [random.randrange(0x80) for i in range(count)]
+	medium = [random.randrange(0x80, 0x4000) for i in range(count)]
+	large = [random.randrange(0x4000, 1 << 32) for i in range(count)]
+	signed = [random.randrange(-(1 << 63), 1 << 63) for i in range(count)]
+
+	for name, values in (("u32 1 byte", small), ("u32 2 bytes", medium), ("u32 3-5 bytes", large)):
+		bench("old " + name, values, writeULEB128, oldReadULEB128)
+		bench("new " + name, values, writeULEB128, readULEB128)
+	bench("new s64", signed, writeSLEB128, readSLEB128)
+	bench("new s32 1 byte", [v - 64 for v in small], writeSLEB128, readSLEB128)
+
+	vector = memoryview(writeULEB128(count) + b"".join(map(writeULEB128, small)))
+	seconds = min(timeit.repeat(lambda: readULEB128Vector(vector, 0), number = 1, repeat = 5))
+	print("%-28s %8.1f ns/value" % ("new u32 vector", seconds / count * 1e9))
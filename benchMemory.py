@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+#
+
+import sys
+import tracemalloc
+
+from Parser import *
+from Decomp import *
+
+def measure(label, function):
+	tracemalloc.start()
+	result = function()
+	current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	print("%-12s current %8.1f MiB   peak %8.1f MiB" % (label, current / 2**20, peak / 2**20))
+	return result
+
+def parseQuiet(file):
+	return WasmParser(mapFile(file)).parseWasm()
+
+def decompileAll(module):
+	contexts = []
+	for func in module.functions:
+		if not func._import:
+			context = DecompilationContext(module, func)
+			decompileExpr(context, func.expr)
+			contexts.append(context)
+	return contexts
+
+if __name__ == '__main__':
+	if len(sys.argv) != 2:
+		print("Usage: benchMemory.py file.wasm")
+		exit(1)
+	with open(sys.argv[1], "rb") as file:
+		module = measure("parse", lambda: parseQuiet(file))
+		contexts = measure("decompile", lambda: decompileAll(module))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+#
+
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from Leb128 import *
+from Parser import *
+from Decomp import *
+from Output import *
+
+def vector(items):
+	return writeULEB128(len(items)) + b"".join(items)
+
+def section(sectionType, payload):
+	return bytes([sectionType]) + writeULEB128(len(payload)) + payload
+
+def encodeName(string):
+	return writeULEB128(len(string)) + string.encode()
+
+def body(code, locals = 1):
+	payload = vector([writeULEB128(locals) + b"\x7f"]) + code + b"\x0b"
+	return writeULEB128(len(payload)) + payload
+
+#builds a module of (i32, i32) -> i32 functions with one memory and one global
+def buildModule(bodies, data = b""):
+	functype = b"\x60" + vector([b"\x7f", b"\x7f"]) + vector([b"\x7f"])
+	module = b"\x00asm\x01\x00\x00\x00"
+	module += section(0x01, vector([functype]))
+	module += section(0x03, vector([writeULEB128(0)] * len(bodies)))
+	module += section(0x05, vector([b"\x00\x01"]))
+	module += section(0x06, vector([b"\x7f\x01\x41" + writeSLEB128(1024) + b"\x0b"]))
+	module += section(0x07, vector([encodeName("main") + b"\x00" + writeULEB128(0)]))
+	module += section(0x0A, vector(bodies))
+	if len(data) != 0:
+		module += section(0x0B, vector([b"\x00\x41" + writeSLEB128(0) + b"\x0b" + writeULEB128(len(data)) + data]))
+	return module
+
+def smallFunction(index):
+	return body(b"\x20\x00\x20\x01\x6a\x41" + writeSLEB128(index) + b"\x6a\x21\x02\x20\x02")
+
+def manySmallFunctions(count = 20000):
+	return buildModule([smallFunction(i) for i in range(count)])
+
+def giantFunction(statements = 50000):
+	code = bytearray()
+	for i in range(statements):
+		code += b"\x20\x02\x20\x00\x41" + writeSLEB128(i) + b"\x6a\x23\x00\x28\x02\x04\x6a\x6a\x21\x02"
+	code += b"\x20\x02"
+	return buildModule([body(bytes(code))])
+
+def deepNesting(depth = 150, functions = 50):
+	code = b"\x02\x40" * depth + b"\x20\x00\x21\x02" + b"\x0b" * depth + b"\x20\x02"
+	return buildModule([body(code)] * functions)
+
+def deepExpression(depth = 10000):
+	code = b"\x20\x00" + b"\x20\x01\x6a" * depth
+	return buildModule([body(code)])
+
+def largeData(size = 16 << 20):
+	return buildModule([smallFunction(0)], bytes(range(256)) * (size // 256))
+
+def hugeBranchTable(targets = 100000):
+	code = b"\x02\x40\x20\x00\x0e" + vector([writeULEB128(0)] * targets) + writeULEB128(0) + b"\x0b\x20\x02"
+	return buildModule([body(code)])
+
+cases = {
+	"many_small": manySmallFunctions,
+	"giant_function": giantFunction,
+	"deep_nesting": deepNesting,
+	"deep_expression": deepExpression,
+	"large_data": largeData,
+	"huge_br_table": hugeBranchTable,
+}
+
+def parse(data):
+	return WasmParser(BufferParser(data)).parseWasm()
+
+def decompile(module):
+	contexts = []
+	for func in module.functions:
+		if not func._import:
+			context = DecompilationContext(module, func)
+			decompileExpr(context, func.expr)
+			context.ret()
+			contexts.append(context)
+	return contexts
+
+def render(module, contexts):
+	output = MemoryWriter()
+	decompileWasmHeader(module, output)
+	for context in contexts:
+		output.writeLine(str(context.func))
+		printExprs(context.exprs, output, 1)
+	return output.getvalue()
+
+def runPhases(data):
+	timings = dict()
+	start = time.perf_counter()
+	module = parse(data)
+	timings["parse"] = time.perf_counter() - start
+	start = time.perf_counter()
+	contexts = decompile(module)
+	timings["decompile"] = time.perf_counter() - start
+	start = time.perf_counter()
+	render(module, contexts)
+	timings["render"] = time.perf_counter() - start
+	return module, timings
+
+def peakMemory(data):
+	tracemalloc.start()
+	module = parse(data)
+	render(module, decompile(module))
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak
+
+#a case is either one of the generated modules or the path of a wasm file
+def loadCase(name):
+	if name in cases:
+		return cases[name]()
+	with open(name, "rb") as file:
+		return file.read()
+
+def runCase(name, repeat, memory):
+	data = loadCase(name)
+	best = None
+	for i in range(repeat):
+		module, timings = runPhases(data)
+		if best == None:
+			best = timings
+		else:
+			best = {phase: min(best[phase], timings[phase]) for phase in timings}
+	functions = len([func for func in module.functions if not func._import])
+	result = {"bytes": len(data), "functions": functions, "seconds": best}
+	result["bytes_per_second"] = {phase: len(data) / seconds for phase, seconds in best.items() if seconds > 0}
+	result["functions_per_second"] = {phase: functions / seconds for phase, seconds in best.items() if seconds > 0}
+	if memory:
+		result["peak_memory"] = peakMemory(data)
+	return result
+
+def report(results, baseline, threshold, noise):
+	regressions = []
+	print("%-16s %-10s %10s %14s %12s %10s" % ("case", "phase", "seconds", "bytes/s", "functions/s", "baseline"))
+	for name, result in results.items():
+		if "error" in result:
+			print("%-16s failed: %s" % (name, result["error"]))
+			continue
+		for phase, seconds in result["seconds"].items():
+			comparison = ""
+			if baseline != None and name in baseline and phase in baseline[name].get("seconds", {}):
+				ratio = seconds / baseline[name]["seconds"][phase]
+				comparison = "%+.0f%%" % ((ratio - 1) * 100)
+				#phases that take only a few milliseconds are dominated by timer noise
+				if ratio > 1 + threshold and seconds - baseline[name]["seconds"][phase] > noise:
+					regressions.append((name, phase, ratio))
+			print("%-16s %-10s %10.4f %14.0f %12.0f %10s" % (name, phase, seconds, result["bytes_per_second"].get(phase, 0), result["functions_per_second"].get(phase, 0), comparison))
+		if "peak_memory" in result:
+			print("%-16s %-10s %10.1f MiB" % (name, "peak", result["peak_memory"] / 2**20))
+	return regressions
+
+if __name__ == '__main__':
+	argparser = argparse.ArgumentParser(description = "Times parsing, decompiling and rendering of synthetic wasm modules")
+	argparser.add_argument("cases", nargs = "*", default = list(cases), help = "cases or wasm files to run, all generated cases by default: " + ", ".join(cases))
+	argparser.add_argument("--repeat", type = int, default = 3, help = "take the best of this many runs")
+	argparser.add_argument("--no-memory", action = "store_true", help = "skip the peak memory measurement")
+	argparser.add_argument("--baseline", metavar = "FILE", help = "compare against the results stored in FILE")
+	argparser.add_argument("--save", metavar = "FILE", help = "store the results in FILE as a new baseline")
+	argparser.add_argument("--threshold", type = float, default = 0.1, help = "relative slowdown reported as regression")
+	argparser.add_argument("--noise", type = float, default = 0.005, help = "ignore slowdowns smaller than this many seconds")
+	args = argparser.parse_args()
+
+	results = dict()
+	for name in args.cases:
+		#a case that can not be decompiled is reported like a regression instead of ending the run
+		try:
+			results[name] = runCase(name, args.repeat, not args.no_memory)
+		except Exception as e:
+			results[name] = {"error": type(e).__name__ + ": " + str(e)}
+
+	baseline = None
+	if args.baseline != None:
+		with open(args.baseline) as file:
+			baseline = json.load(file)
+	regressions = report(results, baseline, args.threshold, args.noise)
+	if args.save != None:
+		with open(args.save, "w") as file:
+			json.dump(results, file, indent = "\t", sort_keys = True)
+	for name, phase, ratio in regressions:
+		print("regression: %s %s is %.0f%% slower than the baseline" % (name, phase, (ratio - 1) * 100))
+	failures = [name for name, result in results.items() if "error" in result]
+	if len(regressions) != 0 or len(failures) != 0:
+		exit(1)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+
+import os
+import re
+import json
+import argparse
+import contextlib
+import collections
+import multiprocessing
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from Parser import *
+from Decomp import *
+from Output import *
+
+#every worker keeps its own lru of lazily parsed modules, keyed by path and modification
+workerModules = collections.OrderedDict()
+workerCapacity = 8
+
+def initWorker(capacity):
+	global workerCapacity
+	workerCapacity = capacity
+
+def openModule(path):
+	path = os.path.abspath(path)
+	stat = os.stat(path)
+	key = (path, stat.st_mtime_ns, stat.st_size)
+	if key in workerModules:
+		workerModules.move_to_end(key)
+		return workerModules[key]
+	with open(path, "rb") as file:
+		module = WasmParser(mapFile(file), lazy = True).parseWasm()
+	workerModules[key] = module
+	while len(workerModules) > workerCapacity:
+		workerModules.popitem(last = False)
+	return module
+
+def listFunctions(path):
+	module = openModule(path)
+	exports = dict()
+	for export in module.exports:
+		if export.type == ExportDescrType.FUNC:
+			exports.setdefault(export.target.id, []).append(export.name)
+	return [{"id": func.id, "name": func.name, "type": str(func.type), "import": func._import, "exports": exports.get(func.id, [])} for func in module.functions]
+
+def renderHeader(path):
+	module = openModule(path)
+	output = MemoryWriter()
+	decompileWasmHeader(module, output)
+	return output.getvalue()
+
+def renderFunctions(path, indices, export_names, patterns):
+	module = openModule(path)
+	output = MemoryWriter()
+	decompileWasmModule(module, output, module.find_functions(indices, export_names, patterns))
+	return output.getvalue()
+
+class DecompileRequestHandler(BaseHTTPRequestHandler):
+	def respond(self, status, body, contentType = "text/plain; charset=utf-8"):
+		data = body.encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", contentType)
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+	def do_GET(self):
+		url = urllib.parse.urlparse(self.path)
+		query = urllib.parse.parse_qs(url.query)
+		if "path" not in query:
+			self.respond(400, "missing path parameter\n")
+			return
+		path = query["path"][0]
+		#a module is only ever opened by the worker its path belongs to, so it is parsed and held once
+		pools = self.server.pools
+		pool = pools[hash(os.path.abspath(path)) % len(pools)]
+		try:
+			if url.path == "/functions":
+				self.respond(200, json.dumps(pool.apply(listFunctions, (path,))), "application/json")
+			elif url.path == "/header":
+				self.respond(200, pool.apply(renderHeader, (path,)))
+			elif url.path == "/decompile":
+				indices = [int(index) for index in query.get("id", [])]
+				self.respond(200, pool.apply(renderFunctions, (path, indices, query.get("export", []), query.get("regex", []))))
+			else:
+				self.respond(404, "unknown endpoint " + url.path + "\n")
+		except KeyError as e:
+			self.respond(404, e.args[0] + "\n")
+		except FileNotFoundError as e:
+			self.respond(404, str(e) + "\n")
+		except (ValueError, re.error) as e:
+			self.respond(400, str(e) + "\n")
+		except ParseException:
+			self.respond(422, path + " is not a valid wasm module\n")
+		except Exception as e:
+			self.respond(500, type(e).__name__ + ": " + str(e) + "\n")
+
+def serve(host, port, jobs, capacity):
+	with contextlib.ExitStack() as stack:
+		pools = [stack.enter_context(multiprocessing.Pool(1, initWorker, (capacity,))) for i in range(jobs or os.cpu_count())]
+		server = ThreadingHTTPServer((host, port), DecompileRequestHandler)
+		server.pools = pools
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			server.server_close()
+
+if __name__ == '__main__':
+	argparser = argparse.ArgumentParser(description = "Serves decompiled functions over HTTP and keeps parsed modules warm")
+	argparser.add_argument("--host", default = "127.0.0.1", help = "address to listen on")
+	argparser.add_argument("--port", type = int, default = 8731, help = "port to listen on")
+	argparser.add_argument("-j", "--jobs", type = int, default = None, metavar = "N", help = "number of worker processes, all cores by default")
+	argparser.add_argument("--modules", type = int, default = 8, metavar = "N", help = "parsed modules each worker keeps open")
+	args = argparser.parse_args()
+	serve(args.host, args.port, args.jobs, args.modules)
@@ -3,35 +3,105 @@
 
 import sys
 import struct
+import logging
+import argparse
 from enum import Enum
 
 from Parser import *
 from Decomp import *
+from ParallelDecomp import *
+from Output import *
+from ModuleCache import *
+import Profile
+from Progress import *
+from StreamParser import *
 
-class PseudoFile:
-	def write(self, string):
-		print(string, end='')
+if __name__ == '__main__':
 
+	argparser = argparse.ArgumentParser(description = "Displays a wasm-file as higher level code")
+	argparser.add_argument("file", help = "the wasm-file to decompile, - streams it from stdin and prints each function once its body arrived")
+	argparser.add_argument("-o", "--output", metavar = "FILE", help = "write the decompiled code to FILE instead of stdout")
+	argparser.add_argument("-f", "--function", type = int, action = "append", default = [], metavar = "INDEX", help = "only decompile the function with this index")
+	argparser.add_argument("-e", "--export", action = "append", default = [], metavar = "NAME", help = "only decompile the function exported under this name")
+	argparser.add_argument("-j", "--jobs", type = int, default = 1, metavar = "N", help = "decompile functions in N worker processes")
+	argparser.add_argument("--cache", metavar = "DIR", help = "keep parsed modules in DIR and reuse them on later runs")
+	argparser.add_argument("--cache-size", type = int, default = 1024, metavar = "MB", help = "evict the least recently used cache entries beyond this size")
+	argparser.add_argument("--function-cache", metavar = "DIR", help = "keep rendered functions in DIR and reuse them for unchanged bodies")
+	argparser.add_argument("--profile", metavar = "FILE", help = "write phase totals and the slowest functions as JSON to FILE, - for stderr")
+	argparser.add_argument("--profile-top", type = int, default = 20, metavar = "N", help = "number of slowest functions in the profile")
+	argparser.add_argument("-v", "--verbose", action = "count", default = 0, help = "log parser progress to stderr, twice for debug output")
+	argparser.add_argument("--progress", action = "store_true", help = "show a periodic progress line on stderr")
+	argparser.add_argument("--inventory", action = "store_true", help = "only parse and list the imports and exports")
+	argparser.add_argument("--calls", action = "store_true", help = "with --inventory, scan the function bodies for unused imports and count their instructions")
+	argparser.add_argument("-r", "--regex", action = "append", default = [], metavar = "PATTERN", help = "only decompile functions whose name or export name matches")
+	args = argparser.parse_args()
 
-if __name__ == '__main__':
+	if args.verbose > 0:
+		logging.basicConfig(level = logging.DEBUG if args.verbose > 1 else logging.INFO, format = "%(levelname)s %(name)s: %(message)s")
 
-	if len(sys.argv) < 2:
-		print("No input-file specified")
-		exit(1)
-	if len(sys.argv) > 2:
-		print("Meow")
-		exit(1)
+	if args.profile != None:
+		Profile.enableProfiling()
 
-	filename = sys.argv[1]
+	if args.file == "-":
+		if args.function or args.export or args.regex or args.inventory:
+			print("Function selection needs a file, stdin is always decompiled whole", file = sys.stderr)
+			exit(1)
+		#the globals, memories and tables depend on sections behind the code, so they follow the functions
+		streamparser = StreamingWasmParser()
+		with openWriter(args.output) as writer:
+			writer.write("\n\n\n\n\n")
+			for item in streamparser.parseFile(sys.stdin.buffer):
+				if type(item) == Function:
+					decompileWasmFunction(streamparser.module, item, writer)
+					releaseFunctionBody(item)
+			decompileWasmHeader(streamparser.module, writer)
+			writer.writeLine()
+		if args.profile != None:
+			Profile.profiler.dump(args.profile, args.profile_top)
+		exit(0)
 
+	with open(args.file, "rb") as file:
+		parser = mapFile(file)
 
-	with open(filename, "rb") as file:
-		parser = StringParser(file.read())
+		if args.inventory:
+			if args.calls:
+				module = WasmParser(parser, lazy = True).parseWasm([SectionType.IMPORT, SectionType.EXPORT, SectionType.CODE])
+			else:
+				module = WasmParser(parser).parseWasm([SectionType.IMPORT, SectionType.EXPORT])
+			with openWriter(args.output) as writer:
+				printInventory(module, writer, parser.data if args.calls else None)
+			exit(0)
 
-		wasmparser = WasmParser(parser)
-		module = wasmparser.parseWasm()
-		
-		print("\n\n\n\n")
+		if args.cache != None:
+			module = ModuleCache(args.cache, args.cache_size << 20).parseWasm(parser)
+		else:
+			wasmparser = WasmParser(parser, lazy = True)
+			module = wasmparser.parseWasm()
+
+		functions = None
+		if args.function or args.export or args.regex:
+			try:
+				functions = module.find_functions(args.function, args.export, args.regex)
+			except KeyError as e:
+				print(e.args[0], file = sys.stderr)
+				exit(1)
 		
-		decompileWasmModule(module, PseudoFile())
-		print()
\ No newline at end of file
+		progress = None
+		if args.progress:
+			progress = ProgressReporter(len([func for func in (functions or module.functions) if not func._import]))
+
+		with openWriter(args.output) as writer:
+			writer.write("\n\n\n\n\n")
+			cache = None
+			if args.function_cache != None:
+				cache = FunctionCache(args.function_cache, parser.data, args.cache_size << 20)
+			if args.jobs > 1:
+				decompileWasmModuleParallel(args.file, module, writer, args.jobs, functions, progress = progress, cache = cache)
+			else:
+				decompileWasmModule(module, writer, functions, cache, progress)
+			writer.writeLine()
+		if progress != None:
+			progress.finish()
+
+	if args.profile != None:
+		Profile.profiler.dump(args.profile, args.profile_top)